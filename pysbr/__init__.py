@@ -20,6 +20,20 @@ from pysbr.queries.searchleagues import SearchLeagues
 from pysbr.queries.searchsports import SearchSports
 from pysbr.queries.sportsbooks import Sportsbooks
 from pysbr.queries.team import Team
+from pysbr.queries.session import (
+    Session,
+    AsyncSession,
+    set_default_session,
+    close_default_async_session,
+)
+from pysbr.queries.scheduler import Scheduler
+from pysbr.queries.batch import execute_batch, execute_concurrently
+from pysbr.queries.cache import SQLiteCache, DirectoryCache, MemoryCache
+from pysbr.queries.eventindex import EventIndex
+from pysbr.queries.eventstore import EventStore
+from pysbr.queries.eventsync import EventSync
+from pysbr.queries.linetable import LineTable
+from pysbr.queries.linepoller import LinePoller
 
 from pysbr.config.sport import (
     Football,
@@ -0,0 +1,3 @@
+from pysbr.config.snapshot import build_snapshot
+
+print(f"Wrote config snapshot to {build_snapshot()}")
@@ -1,12 +1,14 @@
-import pysbr.utils as utils
 from typing import Dict
 
+from pysbr.config.registry import registry
+import pysbr.utils as utils
+
 
 class Config:
     """Base config class to be subclassed by other config classes."""
 
     def __init__(self):
-        self._translations = utils.load_yaml(utils.build_yaml_path("dictionary"))
+        self._translations = registry.yaml("dictionary")
 
     def _translate_dict(self, d: Dict) -> Dict:
         """Given a dict read from config file, make field names more readable.
@@ -43,6 +45,6 @@ class Config:
         """Get the dict containing translations from abbrevations into words.
 
         The keys are abbreviations are from SBR, and the values are their translations
-        into words.
+        into words. A new copy is returned on each call.
         """
-        return self._translations
+        return utils.thaw(self._translations)
@@ -0,0 +1,125 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Type, TypeVar
+
+import pysbr.utils as utils
+from pysbr.config.snapshot import load_snapshot
+
+T = TypeVar("T")
+
+
+class ConfigRegistry:
+    """Process-wide cache of parsed config files.
+
+    Each config file is parsed at most once per process, the first time it is asked
+    for. Everything handed out by the registry is a read-only view (see
+    utils.freeze()), so the same object can safely be shared by every Query and Config
+    instance, across threads.
+
+    Entries are taken from the precompiled snapshot (see pysbr.config.snapshot) when
+    it exists and is up to date with the config files. Otherwise they are built from
+    the YAML files.
+
+    Use the module-level registry instance rather than instantiating this class.
+
+    Attributes:
+        use_snapshot (bool): Whether to look for entries in the snapshot before
+            building them.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._instances = {}
+        self._snapshot = None
+        self.use_snapshot = True
+
+    def _from_snapshot(self, key: Hashable) -> Any:
+        """Get the entry stored under key in the snapshot, or None if there isn't one.
+
+        The snapshot is loaded the first time this method is called.
+        """
+        if not self.use_snapshot:
+            return None
+        if self._snapshot is None:
+            self._snapshot = load_snapshot()
+        return self._snapshot.get(key)
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Get the entry stored under key, building it with factory if it is missing.
+
+        The value returned by factory is frozen before it is stored. factory is called
+        at most once per key, even if several threads ask for the same key at once, and
+        not at all if the key is in the snapshot.
+        """
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._entries:
+                value = self._from_snapshot(key)
+                if value is None:
+                    value = factory()
+                self._entries[key] = utils.freeze(value)
+            return self._entries[key]
+
+    def yaml(self, fname: str) -> Any:
+        """Get the contents of the config file fname, as a read-only view.
+
+        fname is the name of a file in the config folder, without the .yaml extension.
+
+        Raises:
+            FileNotFoundError: If there is no config file called fname.
+        """
+        return self.get(
+            ("yaml", fname), lambda: utils.load_yaml(utils.build_yaml_path(fname))
+        )
+
+    def translated(self, fname: str, translate: Callable[[Dict], Dict]) -> Any:
+        """Get the contents of the config file fname, after translating with translate.
+
+        translate is only called the first time the file is asked for, so it must not
+        depend on the caller's state other than the translations dictionary.
+
+        Raises:
+            FileNotFoundError: If there is no config file called fname.
+        """
+        return self.get(
+            ("translated", fname),
+            lambda: translate(utils.load_yaml(utils.build_yaml_path(fname))),
+        )
+
+    def instance(self, cls: Type[T]) -> T:
+        """Get the shared instance of the config class cls, creating it on first use.
+
+        Config classes that take no arguments (Sportsbook, and the sport and league
+        classes such as NFL or Football) hold the same data in every instance, so a
+        single instance can serve the whole process. Instances are not part of the
+        snapshot, and must be treated as read-only.
+        """
+        try:
+            return self._instances[cls]
+        except KeyError:
+            pass
+        with self._lock:
+            if cls not in self._instances:
+                self._instances[cls] = cls()
+            return self._instances[cls]
+
+    def entries(self) -> Dict[Hashable, Any]:
+        """Get a copy of the dict holding all entries built so far."""
+        with self._lock:
+            return dict(self._entries)
+
+    def clear(self) -> None:
+        """Drop all cached entries and instances, so that they are built again on use.
+
+        The snapshot is dropped as well, and is reloaded the next time it is needed.
+        """
+        with self._lock:
+            self._entries = {}
+            self._instances = {}
+            self._snapshot = None
+
+
+registry = ConfigRegistry()
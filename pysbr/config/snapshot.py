@@ -0,0 +1,116 @@
+"""Build and load the precompiled config snapshot.
+
+The snapshot is a pickle of every entry in the config registry: the parsed and
+translated config files, along with the finished market, team and sportsbook search
+dictionaries. Loading it is much faster than parsing the YAML files with PyYAML, which
+matters for short-lived processes.
+
+Build the snapshot from the project root with:
+
+    python -m pysbr.config
+
+If the snapshot is missing, or any config file has changed since it was built, the
+registry falls back to parsing the YAML files.
+"""
+import hashlib
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional
+
+import pysbr.utils as utils
+
+SNAPSHOT_VERSION = 1
+
+
+def config_dir() -> Path:
+    """Get the path to the folder holding the config files."""
+    return utils.build_yaml_path("dictionary").parent
+
+
+def snapshot_path() -> Path:
+    """Get the path the snapshot is written to and read from."""
+    return config_dir().joinpath("snapshot.pickle")
+
+
+def config_digest() -> str:
+    """Get a digest of the contents of all the config files.
+
+    The digest is stored in the snapshot, and is used to tell whether the snapshot is
+    out of date.
+    """
+    h = hashlib.sha1()
+    for path in sorted(config_dir().glob("*.yaml")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def load_snapshot(path: Optional[Path] = None) -> Dict[Hashable, Any]:
+    """Load the registry entries stored in the snapshot.
+
+    An empty dict is returned if the snapshot does not exist, was built by a different
+    version of this module, or is out of date with the config files.
+    """
+    path = snapshot_path() if path is None else path
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+
+    if (
+        snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("digest") != config_digest()
+    ):
+        return {}
+    return snapshot["entries"]
+
+
+def build_snapshot(path: Optional[Path] = None) -> Path:
+    """Compile all config files into the snapshot, and return its path.
+
+    Every config class is instantiated with the snapshot disabled, so that the registry
+    holds freshly built entries for all of them, which are then written to path.
+    """
+    # Imported here to avoid circular imports; sport and sportsbook import registry.
+    from pysbr.config.registry import registry
+    from pysbr.config.sport import Sport
+    from pysbr.config.sportsbook import Sportsbook
+
+    path = snapshot_path() if path is None else path
+
+    use_snapshot = registry.use_snapshot
+    registry.use_snapshot = False
+    registry.clear()
+    try:
+        for fname in ["arguments", "fields", "dtypes"]:
+            registry.yaml(fname)
+
+        Sportsbook()
+        for cls in _leaf_subclasses(Sport):
+            # Skip user-defined subclasses, which may take arguments.
+            if cls.__module__ == Sport.__module__:
+                cls()
+
+        entries = {k: utils.thaw(v) for k, v in registry.entries().items()}
+    finally:
+        registry.use_snapshot = use_snapshot
+        registry.clear()
+
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "digest": config_digest(),
+        "entries": entries,
+    }
+    with open(path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _leaf_subclasses(cls: type):
+    """Yield the subclasses of cls that have no subclasses of their own."""
+    for sub in cls.__subclasses__():
+        if sub.__subclasses__():
+            yield from _leaf_subclasses(sub)
+        else:
+            yield sub
@@ -4,6 +4,7 @@ from typing import Dict, List, Union
 
 import pysbr.utils as utils
 from pysbr.config.config import Config
+from pysbr.config.registry import registry
 
 
 class Sport(Config):
@@ -26,15 +27,13 @@ class Sport(Config):
     def __init__(self, sport_config: Dict):
         super().__init__()
 
-        self._search_translations = utils.load_yaml(
-            utils.build_yaml_path("search_dictionary")
-        )
+        self._search_translations = registry.yaml("search_dictionary")
 
-        self._sport = self._translate_dict(
-            utils.load_yaml(utils.build_yaml_path(sport_config))
-        )
+        self._sport = registry.translated(sport_config, self._translate_dict)
 
-        self._market_ids = self._build_market_ids()
+        self._market_ids = registry.get(
+            ("market ids", sport_config), self._build_market_ids
+        )
 
         self.market_names = self._build_market_names(self._sport["markets"])
         self.market_periods = self._build_market_periods(self._sport["markets"])
@@ -42,7 +41,7 @@ class Sport(Config):
 
         self.sport_id = self._sport["sport id"]
         self.default_market_id = self._sport["default market id"]
-        self.consensus_market_ids = self._sport["consensus market ids"]
+        self.consensus_market_ids = list(self._sport["consensus market ids"])
 
     def _build_market_ids(self) -> Dict[str, int]:
         """Build the dictionary that is used for searching available betting markets.
@@ -261,16 +260,16 @@ class Sport(Config):
         """Get the dictionary created from the sport's config file.
 
         The dict holds values for 'sport id' and 'default market id', as well as a list
-        of all markets available on the sport.
+        of all markets available on the sport. A new copy is returned on each call.
         """
-        return self._sport
+        return utils.thaw(self._sport)
 
     def search_translations(self) -> Dict[str, str]:
         """Get the dict containing translations for search abbreviatons / spelling variants.
 
         This is the dict that is used Sport.market_ids().
         """
-        return self._search_translations
+        return utils.thaw(self._search_translations)
 
 
 class League(Sport):
@@ -291,9 +290,7 @@ class League(Sport):
     def __init__(self, sport_config, league_config):
         super().__init__(sport_config)
 
-        self._league = self._translate_dict(
-            utils.load_yaml(utils.build_yaml_path(league_config))
-        )
+        self._league = registry.translated(league_config, self._translate_dict)
         self.league_id = self._league["league id"]
         self.league_name = self._league["name"]
         self.abbr = self._league["abbreviation"]
@@ -305,8 +302,9 @@ class League(Sport):
 
         The dict holds values for 'league id', 'name', 'abbreviation'. For leagues
         inheriting from TeamSport, it also holds a list of all teams in the league.
+        A new copy is returned on each call.
         """
-        return self._league
+        return utils.thaw(self._league)
 
 
 class TeamLeague(League):
@@ -323,7 +321,7 @@ class TeamLeague(League):
     def __init__(self, sport_config, league_config):
         super().__init__(sport_config, league_config)
 
-        self._team_ids = self._build_team_ids()
+        self._team_ids = registry.get(("team ids", league_config), self._build_team_ids)
 
     def _build_team_ids(self) -> Dict[str, Dict[str, Union[int, List[int]]]]:
         """Build team id search dictionary.
@@ -426,7 +424,8 @@ class TeamLeague(League):
                     ids.append(match)
                 except IndexError:
                     raise ValueError(f"Could not find team {old_t}.")
-                if isinstance(match, list):
+                # Ambiguous terms map to a list of ids, which is a tuple once frozen.
+                if isinstance(match, (list, tuple)):
                     raise ValueError(
                         utils.str_format(
                             f"""Search term '{old_t}' is ambiguous.
@@ -521,7 +520,7 @@ class NCAAB(TeamLeague):
     def __init__(self):
         super().__init__("basketball", "ncaab")
 
-        self._market_ids = self._build_market_ids()
+        self._market_ids = registry.get(("market ids", "ncaab"), self._build_market_ids)
 
         self.market_names = self._build_market_names(self._league["markets"])
         self.market_periods = self._build_market_periods(self._league["markets"])
@@ -3,6 +3,7 @@ from collections import OrderedDict
 
 import pysbr.utils as utils
 from pysbr.config.config import Config
+from pysbr.config.registry import registry
 
 
 class Sportsbook(Config):
@@ -28,10 +29,10 @@ class Sportsbook(Config):
     def __init__(self):
         super().__init__()
 
-        self._sportsbooks = self._translate_dict(
-            utils.load_yaml(utils.build_yaml_path("sportsbooks"))
+        self._sportsbooks = registry.translated("sportsbooks", self._translate_dict)
+        self._sportsbook_ids = registry.get(
+            ("sportsbook ids",), self._build_sportsbook_ids
         )
-        self._sportsbook_ids = self._build_sportsbook_ids()
 
         self.names = {}
         for sb in self._sportsbooks["sportsbooks"]:
@@ -61,9 +62,10 @@ class Sportsbook(Config):
         """Get sportsbook config list.
 
         Each list element is a dict representing a sportsbook, with 'name',
-        n 'short name', 'sportsbook id' and 'system sportsbook id' as keys.
+        n 'short name', 'sportsbook id' and 'system sportsbook id' as keys. A new
+        copy is returned on each call.
         """
-        return self._sportsbooks
+        return utils.thaw(self._sportsbooks)
 
     def id(self, term: Union[int, str]) -> Optional[int]:
         """Take provided search term and return matching sportsbook id.
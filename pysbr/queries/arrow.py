@@ -0,0 +1,246 @@
+"""Export query results to Apache Arrow tables and Parquet files.
+
+pyarrow is an optional dependency (pip install python-sbr[arrow]); it is imported the
+first time a table is built, so the rest of the package works without it.
+
+Queries about events, lines, consensus history and markets are exported with a fixed
+schema, so that tables built from different responses can be concatenated, and
+written to the same dataset. Fields missing from a response are null, and fields not
+in the schema are left out. Other queries are exported with the schema pyarrow infers
+from their response.
+
+Column names are the translated field names used by Query.list(). Datetime fields are
+timestamp('ms', 'UTC') columns, whether the query keeps native datetimes or not.
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+from pysbr.queries.translator import DATETIME_KEYS
+
+# Format of the ISO strings Translator produces from timestamps.
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+# Number of elements converted and written to Parquet at a time.
+BATCH_SIZE = 65536
+
+
+@lru_cache(maxsize=None)
+def schema(name: str):
+    """Get the Arrow schema of the results of one kind of query.
+
+    name is 'events', 'lines', 'consensus' or 'markets'.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+        KeyError: If there is no schema called name.
+    """
+    import pyarrow as pa
+
+    timestamp = pa.timestamp("ms", tz="UTC")
+    source = pa.struct(
+        [
+            ("name", pa.string()),
+            ("nickname", pa.string()),
+            ("short name", pa.string()),
+            ("abbreviation", pa.string()),
+            ("location", pa.string()),
+            ("first name", pa.string()),
+            ("last name", pa.string()),
+            ("participant group id", pa.int64()),
+        ]
+    )
+    participant = pa.struct(
+        [
+            ("participant id", pa.int64()),
+            ("is home", pa.bool_()),
+            ("source", source),
+        ]
+    )
+    score = pa.struct(
+        [
+            ("participant id", pa.int64()),
+            ("period", pa.int64()),
+            ("points scored", pa.float64()),
+        ]
+    )
+    line = [
+        ("event id", pa.int64()),
+        ("market id", pa.int64()),
+        ("sportsbook id", pa.int64()),
+        ("participant id", pa.int64()),
+        ("spread / total", pa.float64()),
+        ("decimal odds", pa.float64()),
+        ("american odds", pa.float64()),
+        ("datetime", timestamp),
+    ]
+    # Added by Lines when the events the lines are for are passed in.
+    line_info = [
+        ("event", pa.string()),
+        ("market", pa.string()),
+        ("sportsbook", pa.string()),
+        ("sportsbook alias", pa.string()),
+        ("participant", pa.string()),
+        ("participant full name", pa.string()),
+        ("result", pa.string()),
+        ("profit", pa.float64()),
+        ("participant score", pa.float64()),
+    ]
+
+    schemas = {
+        "events": [
+            ("event id", pa.int64()),
+            ("sport id", pa.int64()),
+            ("league id", pa.int64()),
+            ("season id", pa.int64()),
+            ("description", pa.string()),
+            ("sport", pa.string()),
+            ("league", pa.string()),
+            ("location", pa.string()),
+            ("country", pa.string()),
+            ("stadium type", pa.string()),
+            ("event status", pa.string()),
+            ("datetime", timestamp),
+            (
+                "event group",
+                pa.struct(
+                    [
+                        ("event group id", pa.int64()),
+                        ("name", pa.string()),
+                        ("alias", pa.string()),
+                    ]
+                ),
+            ),
+            ("participants", pa.list_(participant)),
+            ("scores", pa.list_(score)),
+        ],
+        "lines": line + line_info,
+        "consensus": [
+            ("event id", pa.int64()),
+            ("market id", pa.int64()),
+            ("sportsbook id", pa.int64()),
+            ("system sportsbook id", pa.int64()),
+            ("participant id", pa.int64()),
+            ("line id", pa.int64()),
+            ("wagers", pa.int64()),
+            ("percentage", pa.float64()),
+            ("volume", pa.float64()),
+            ("total volume", pa.float64()),
+            ("datetime", timestamp),
+            ("line", pa.struct(line)),
+        ]
+        + line_info,
+        "markets": [
+            ("market id", pa.int64()),
+            ("event id", pa.int64()),
+            ("league id", pa.int64()),
+            ("sport id", pa.int64()),
+            ("name", pa.string()),
+        ],
+    }
+    return pa.schema(schemas[name])
+
+
+def _has_timestamp(t) -> bool:
+    """Check whether the Arrow type t is or holds a timestamp."""
+    import pyarrow as pa
+
+    if pa.types.is_timestamp(t):
+        return True
+    if pa.types.is_struct(t):
+        return any(_has_timestamp(f.type) for f in t)
+    if pa.types.is_list(t):
+        return _has_timestamp(t.value_type)
+    return False
+
+
+def _timestamps(values: List[Any], t):
+    """Build a timestamp array from Unix timestamps in milliseconds or ISO strings."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arr = pa.array(values)
+    if pa.types.is_string(arr.type):
+        arr = pc.strptime(arr, format=ISO_FORMAT, unit="ms")
+    return arr.cast(t)
+
+
+def _array(values: List[Any], t):
+    """Build an array of type t from the values of one field of each element."""
+    import pyarrow as pa
+
+    if not _has_timestamp(t):
+        return pa.array(values, type=t)
+    if pa.types.is_timestamp(t):
+        return _timestamps(values, t)
+    if pa.types.is_struct(t):
+        # Build each child separately, so that nested timestamps are converted too.
+        dicts = [v if isinstance(v, dict) else {} for v in values]
+        children = [_array([d.get(f.name) for d in dicts], f.type) for f in t]
+        mask = pa.array([not isinstance(v, dict) for v in values])
+        return pa.StructArray.from_arrays(children, fields=list(t), mask=mask)
+    raise TypeError(f"Can't build arrays of {t} from query results.")
+
+
+def build_table(data: List[Any], schema_name: Optional[str] = None):
+    """Build an Arrow table with a row for each translated element of data.
+
+    Args:
+        data: The translated elements of a response.
+        schema_name: The name of the schema of the table (see schema()). If None, the
+            schema is inferred from data.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow as pa
+
+    if schema_name is not None:
+        s = schema(schema_name)
+        columns = [_array([el.get(f.name) for el in data], f.type) for f in s]
+        return pa.Table.from_arrays(columns, schema=s)
+
+    if not all(isinstance(el, dict) for el in data):
+        return pa.table({"value": data})
+
+    table = pa.Table.from_pylist(data)
+    for i, name in enumerate(table.column_names):
+        if name in DATETIME_KEYS:
+            column = _timestamps(
+                table.column(i).to_pylist(), pa.timestamp("ms", tz="UTC")
+            )
+            table = table.set_column(i, name, column)
+    return table
+
+
+def write_parquet(
+    data: List[Any],
+    path: Union[str, Path],
+    schema_name: Optional[str] = None,
+    **kwargs,
+) -> None:
+    """Write the translated elements of data to a Parquet file.
+
+    Elements are converted and written BATCH_SIZE at a time when the schema is fixed,
+    so only one batch is held as Arrow arrays at once.
+
+    Args:
+        data: The translated elements of a response.
+        path: Path of the file to write.
+        schema_name: The name of the schema of the file (see schema()). If None, the
+            schema is inferred from data.
+        kwargs: Passed on to pyarrow.parquet.ParquetWriter, e.g. compression.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow.parquet as pq
+
+    if schema_name is None:
+        pq.write_table(build_table(data), str(path), **kwargs)
+        return
+
+    with pq.ParquetWriter(str(path), schema(schema_name), **kwargs) as writer:
+        for start in range(0, len(data), BATCH_SIZE):
+            end = start + BATCH_SIZE
+            writer.write_table(build_table(data[start:end], schema_name))
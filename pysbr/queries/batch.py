@@ -0,0 +1,146 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from gql import gql
+
+from pysbr.queries.query import Query
+from pysbr.queries.session import Session
+import pysbr.utils as utils
+
+
+def _build_batch_string(queries: List[Query]) -> str:
+    """Merge the pending queries into one GraphQL document.
+
+    Each query becomes a field of the document, aliased by its position in the list
+    (q0, q1, ...), so that several queries with the same name can be sent at once.
+    """
+    selections = []
+    for i, q in enumerate(queries):
+        q_name, q_fields, q_arg_str, q_args = q._pending
+        args = q._build_args(q_arg_str, q_args)
+        selection = f"q{i}: {q_name}"
+        if args is not None:
+            selection += f"({utils.str_format(args, squish=True)})"
+        if q_fields is not None:
+            selection += f" {utils.str_format(q_fields, indent_=1, dedent_l1=True)}"
+        selections.append(utils.str_format(selection, indent_=1))
+
+    # graphql query will not accept single quotes, but Template string by default uses
+    # single quotes
+    return "query {\n" + "\n".join(selections).replace("'", '"') + "\n}"
+
+
+def execute_batch(
+    queries: List[Query], session: Optional[Session] = None, max_size: int = 50
+) -> List[Query]:
+    """Execute many lazy queries using as few requests to the server as possible.
+
+    The queries should be constructed with Query.deferred(), or with Query.lazy set.
+    Their query strings are merged into one GraphQL document using aliases, which is
+    sent as a single request, and the response is split back into each query's raw().
+    Queries that have already been executed are skipped.
+
+    Queries that need more than one request (EventsByParticipants) are executed in
+    rounds, with the next request of every such query sent in the same batch.
+
+    Responses are looked up in and stored to each query's cache (see Query.cache), so
+    only queries without a cached response are sent to the server.
+
+    Each request is paced by the scheduler of the first query in its batch (see
+    Query.scheduler), in the most urgent priority lane of the queries in the batch.
+
+    Example:
+        queries = [LineHistory.deferred(eid, mid, sid, pids) for sid in sportsbook_ids]
+        execute_batch(queries)
+        dfs = [q.dataframe() for q in queries]
+
+    Args:
+        queries: The queries to execute.
+        session: The session used to send the requests. If None, the session of the
+            first query is used.
+        max_size: The max number of queries merged into one request.
+
+    Returns:
+        The list of queries passed in, now executed.
+
+    Raises:
+        gql.Exception: If the server raises an error during execution of any of the
+            queries in a batch. The queries in that batch are left unexecuted.
+    """
+    while True:
+        pending = [q for q in queries if q._pending is not None]
+        if not pending:
+            return queries
+        if session is None:
+            session = pending[0].session
+
+        uncached = []
+        for q in pending:
+            raw = q._get_cached(q._build_pending_query_string())
+            if raw is None:
+                uncached.append(q)
+            else:
+                q._pending = None
+                q._receive(raw)
+
+        for start in range(0, len(uncached), max_size):
+            end = start + max_size
+            batch = uncached[start:end]
+            document = gql(_build_batch_string(batch))
+            scheduler = batch[0].scheduler
+            if scheduler is None:
+                response = session.execute(document)
+            else:
+                priority = min(q.priority for q in batch)
+                response = scheduler.run(lambda: session.execute(document), priority)
+            for j, q in enumerate(batch):
+                q_name = q._pending[0]
+                q_string = q._build_pending_query_string()
+                q._pending = None
+                raw = {q_name: response[f"q{j}"]}
+                q._set_cached(q_string, raw)
+                q._receive(raw)
+
+
+def execute_concurrently(
+    queries: Iterable[Query], max_workers: int = 4
+) -> Iterator[Query]:
+    """Execute lazy queries in a pool of threads, yielding each one once executed.
+
+    Unlike execute_batch(), each query is sent as its own request, so a slow or large
+    response doesn't hold up the others. Queries are yielded in the order they are
+    given, as soon as they and all queries before them are executed. At most
+    2 * max_workers queries are executing or waiting to be yielded at any time, so the
+    responses held in memory stay bounded however many queries are passed in.
+
+    Example:
+        queries = (LineHistory.deferred(eid, mid, sid, pids) for sid in sportsbook_ids)
+        for i, q in enumerate(execute_concurrently(queries, max_workers=8)):
+            q.to_parquet(f"lines_{i}.parquet")
+
+    Args:
+        queries: The queries to execute, e.g. constructed with Query.deferred().
+        max_workers: The max number of queries executing at once.
+
+    Raises:
+        gql.Exception: If the server raises an error during execution of any of the
+            queries. Queries that haven't started yet are not executed.
+        ValueError: If max_workers is less than 1.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1.")
+
+    queries = iter(queries)
+    with ThreadPoolExecutor(max_workers) as pool:
+        pending = deque()
+        try:
+            for q in queries:
+                pending.append(pool.submit(q.execute))
+                if len(pending) >= 2 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -2,6 +2,7 @@ from typing import List, Union
 
 from pysbr.queries.lines import Lines
 from pysbr.queries.query import Query
+from pysbr.queries.scheduler import HIGH
 import pysbr.utils as utils
 
 
@@ -21,6 +22,9 @@ class BestLines(Lines):
         market_ids: SBR betting market id or list of market ids.
     """
 
+    cache_ttl = 10
+    priority = HIGH
+
     @Query.typecheck
     def __init__(
         self, event_ids: Union[List[int], int], market_ids: Union[List[int], int]
@@ -0,0 +1,301 @@
+from collections import OrderedDict
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+# TTL for responses that never change, such as the line history of a completed event.
+FOREVER = math.inf
+
+
+def normalize_query(q: str) -> str:
+    """Collapse all whitespace in the query string q, for use as a cache key."""
+    return " ".join(q.split())
+
+
+def _copy_sized(item: Any) -> Tuple[Any, int]:
+    """Copy the JSON-like item, and estimate its size in bytes, in one walk.
+
+    Dicts and lists are copied at every level of nesting. The size counts the length
+    of strings and 8 bytes for each other value and container entry, which tracks
+    the size of the response as JSON closely enough to bound the memory cache.
+    """
+    if isinstance(item, dict):
+        out = {}
+        size = 8
+        for k, v in item.items():
+            out[k], n = _copy_sized(v)
+            size += n + len(k) + 8
+        return out, size
+    elif isinstance(item, list):
+        out = []
+        size = 8
+        for x in item:
+            x, n = _copy_sized(x)
+            out.append(x)
+            size += n + 8
+        return out, size
+    elif isinstance(item, str):
+        return item, len(item)
+    else:
+        return item, 8
+
+
+def _copy(item: Any) -> Any:
+    """Copy the JSON-like item, copying dicts and lists at every level of nesting."""
+    if isinstance(item, dict):
+        return {k: _copy(v) for k, v in item.items()}
+    elif isinstance(item, list):
+        return [_copy(x) for x in item]
+    else:
+        return item
+
+
+class Cache:
+    """Base class for response caches.
+
+    A cache maps normalized query strings to the raw responses from the server. Each
+    response is stored with a time to live (TTL) in seconds, after which it is
+    considered stale and is not returned by get().
+
+    To cache the responses of all queries, assign a cache to Query.cache, e.g.
+
+        Query.cache = SQLiteCache("sbr.sqlite")
+
+    How long responses are kept for is set per query class by Query.cache_ttl.
+
+    This class should not be directly instantiated; use SQLiteCache or DirectoryCache,
+    or subclass it to add a new backend.
+    """
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Get the response stored under key, or None if it is missing or stale."""
+        raise NotImplementedError
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict, Optional[float]]]:
+        """Get the response stored under key, and the Unix time it expires at.
+
+        None is returned if the response is missing or stale. The expiry is inf for
+        responses kept forever, and None if the backend doesn't know it.
+        """
+        value = self.get(key)
+        return None if value is None else (value, None)
+
+    def set(self, key: str, value: Dict, ttl: float) -> None:
+        """Store the response value under key, for ttl seconds."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove all responses from the cache."""
+        raise NotImplementedError
+
+    def _expires(self, ttl: float) -> float:
+        """Get the Unix time at which a response stored now with ttl expires."""
+        return math.inf if ttl == FOREVER else time.time() + ttl
+
+
+class SQLiteCache(Cache):
+    """Response cache stored in an SQLite database file.
+
+    Safe to share between threads. Several processes may use the same file.
+
+    Args:
+        path: Path of the database file. It is created if it doesn't exist.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+                """
+            )
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict, Optional[float]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Dict, ttl: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._expires(ttl)),
+            )
+
+    def purge(self) -> None:
+        """Remove stale responses from the database."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM responses WHERE expires <= ?", (time.time(),)
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            self._conn.close()
+
+
+class DirectoryCache(Cache):
+    """Response cache stored as one JSON file per response in a directory.
+
+    Files are named by a hash of the key, and are written atomically, so the directory
+    can be shared between threads and processes.
+
+    Args:
+        path: Path of the directory. It is created if it doesn't exist.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, key: str) -> Path:
+        """Get the path of the file the response for key is stored in."""
+        return self.path.joinpath(f"{hashlib.sha1(key.encode()).hexdigest()}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict, Optional[float]]]:
+        try:
+            with open(self._file(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # json can't represent infinity, so responses kept forever have no expiry.
+        expires = entry["expires"]
+        if entry["key"] != key or (expires is not None and expires <= time.time()):
+            return None
+        return entry["value"], math.inf if expires is None else expires
+
+    def set(self, key: str, value: Dict, ttl: float) -> None:
+        expires = self._expires(ttl)
+        entry = {
+            "key": key,
+            "expires": None if expires == math.inf else expires,
+            "value": value,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def clear(self) -> None:
+        for path in self.path.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+class MemoryCache(Cache):
+    """Least recently used cache of responses, held in the memory of this process.
+
+    The cache is bounded both by number of responses and by their total size, which is
+    estimated while copying each response in (see _copy_sized()). When either bound is
+    exceeded, the least recently used responses are evicted.
+
+    To check the memory cache before the cache on disk and the network for all queries,
+    assign it to Query.memory_cache, e.g.
+
+        Query.memory_cache = MemoryCache(max_entries=1000)
+
+    Responses are copied when they are stored and when they are returned, so callers
+    may modify them without changing the cached response. Safe to share between
+    threads.
+
+    Args:
+        max_entries: The max number of responses held.
+        max_bytes: The max approximate size of all responses held, in bytes.
+
+    Attributes:
+        hits (int): Number of calls to get() that found a fresh response.
+        misses (int): Number of calls to get() that did not.
+        evictions (int): Number of responses removed to keep the cache within bounds.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (value, expires, size), least recently used first.
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+        return _copy(value)
+
+    def set(self, key: str, value: Dict, ttl: float) -> None:
+        value, size = _copy_sized(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, self._expires(ttl), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """Remove the response stored under key. The caller must hold the lock."""
+        self._bytes -= self._entries.pop(key)[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Get the hit, miss and eviction counts, and the current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -1,7 +1,8 @@
-from typing import List, Union
+from typing import Dict, List, Union
 
 from pysbr.queries.lines import Lines
 from pysbr.queries.query import Query
+from pysbr.queries.scheduler import LOW
 import pysbr.utils as utils
 
 
@@ -25,6 +26,10 @@ class ConsensusHistory(Lines):
         market_ids: SBR betting market ids.
     """
 
+    cache_ttl = 60
+    priority = LOW
+    _arrow_schema = "consensus"
+
     @Query.typecheck
     def __init__(self, event_id: int, market_ids: Union[List[int], int]):
         super().__init__()
@@ -36,3 +41,6 @@ class ConsensusHistory(Lines):
         self._raw = self._build_and_execute_query(
             self.name, self.fields, self.arg_str, self.args
         )
+
+    def _response_ttl(self, raw: Dict) -> float:
+        return self._history_ttl(raw[self.name])
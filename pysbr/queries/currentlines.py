@@ -2,6 +2,7 @@ from typing import List, Union
 
 from pysbr.queries.lines import Lines
 from pysbr.queries.query import Query
+from pysbr.queries.scheduler import HIGH
 import pysbr.utils as utils
 
 
@@ -18,6 +19,9 @@ class CurrentLines(Lines):
         sportsbook_ids: SBR sportsbook id or list of sportsbook ids.
     """
 
+    cache_ttl = 10
+    priority = HIGH
+
     @Query.typecheck
     def __init__(
         self,
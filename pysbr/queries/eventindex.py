@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional, Set, Union
+
+from pysbr.queries.query import Query
+
+
+class EventIndex:
+    """Information about a set of events, keyed by event id.
+
+    Lines queries use the index to add event descriptions, participant names and bet
+    results to each line. The index is built in a single pass over the translated
+    response of an events query, without copying it, and is read-only afterwards, so
+    one index can be shared by any number of Lines queries and list() / dataframe()
+    calls.
+
+    Use EventIndex.of() to get the index of an events query, which is built the first
+    time it is asked for and then cached on the query. An EventIndex can be passed
+    anywhere Lines accepts events, e.g.
+
+        index = EventIndex.of(EventsByDate(league_id, dt))
+        for lines in polls:
+            lines.dataframe(index)
+
+    Args:
+        events: Any query returning events, e.g. EventsByDate or SearchEvents.
+
+    Attributes:
+        descriptions (Dict[int, str]): Map event id to description.
+        leagues (Dict[int, int]): Map event id to league id.
+        sports (Dict[int, int]): Map event id to sport id.
+        scores (Dict[int, List[Dict]]): Map event id to period scores.
+        statuses (Dict[int, str]): Map event id to event status.
+        participants (Dict[int, Optional[str]]): Map participant id to short name,
+            i.e. team abbreviation or individual's last name.
+        participants_full (Dict[int, str]): Map participant id to full name.
+        league_ids (Set[int]): Ids of all leagues the events are in.
+        sport_ids (Set[int]): Ids of all sports the events are in.
+    """
+
+    def __init__(self, events: Query):
+        events.execute()
+        self._source = events._translated_list()
+
+        self.descriptions: Dict[int, str] = {}
+        self.leagues: Dict[int, int] = {}
+        self.sports: Dict[int, int] = {}
+        self.scores: Dict[int, List[Dict]] = {}
+        self.statuses: Dict[int, str] = {}
+        self.participants: Dict[int, Optional[str]] = {}
+        self.participants_full: Dict[int, str] = {}
+        self.league_ids: Set[int] = set()
+        self.sport_ids: Set[int] = set()
+
+        # TODO: All these Dict.get() calls are unnecessary because the GQL query
+        # structure should have key with empty string at least.
+        # GraphQL types implementing an interface are guaranteed to implement those
+        # fields.
+        for e in self._source:
+            event_id = e.get("event id")
+            self.descriptions[event_id] = e.get("description")
+            self.leagues[event_id] = e.get("league id")
+            self.sports[event_id] = e.get("sport id")
+            self.scores[event_id] = e.get("scores")
+            self.statuses[event_id] = e.get("event status")
+            self.league_ids.add(e.get("league id"))
+            self.sport_ids.add(e.get("sport id"))
+
+            for p in e["participants"]:
+                self._add_participant(p)
+
+    def _add_participant(self, p: Dict) -> None:
+        """Add the names of participant p of an event."""
+        participant_id = p["participant id"]
+        source = p["source"]
+
+        if "abbreviation" in source:
+            # case 1, team: abbr, full name
+            self.participants[participant_id] = source["abbreviation"]
+            # Using short name instead of location because SearchEvents don't
+            # have location. Also college sports use short name.
+            short_name = source["short name"]
+            nickname = source["nickname"]
+            if short_name and nickname:
+                # American leagues have these filled out.
+                self.participants_full[participant_id] = f"{short_name} {nickname}"
+            else:
+                # Other leagues should have full name available.
+                self.participants_full[participant_id] = source["name"]
+
+        elif "last name" in source:
+            # case 2, individual: lname, full name
+            fname = source["first name"]
+            lname = source["last name"]
+            self.participants[participant_id] = lname
+            self.participants_full[participant_id] = f"{fname} {lname}"
+
+        elif "participant group id" in source:
+            # case 3, pairs (eg doubles tennis): None, full name
+            self.participants[participant_id] = None
+            self.participants_full[participant_id] = source["name"]
+
+    @classmethod
+    def of(cls, events: Union[Query, "EventIndex"]) -> "EventIndex":
+        """Get the index of an events query, building it if it isn't cached yet.
+
+        The index is cached on the query, and rebuilt only if the query's response
+        changes (e.g. EventsByParticipants receiving its second response). If events is
+        already an EventIndex, it is returned as is.
+        """
+        if isinstance(events, EventIndex):
+            return events
+        events.execute()
+        index = getattr(events, "_event_index", None)
+        if index is None or index._source is not events._translated_list():
+            index = cls(events)
+            events._event_index = index
+        return index
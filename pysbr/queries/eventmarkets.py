@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from pysbr.queries.query import Query
 
 
@@ -10,6 +12,8 @@ class EventMarkets(Query):
         event_id: SBR event id.
     """
 
+    _arrow_schema = "markets"
+
     @Query.typecheck
     def __init__(self, event_id: int):
         super().__init__()
@@ -22,3 +26,11 @@ class EventMarkets(Query):
         )
 
         self._subpath_keys = ["mtids"]
+
+    def _arrow_data(self) -> List[Dict[str, int]]:
+        """Get a market for each market id, so that the markets schema fits."""
+        self._execute_pending()
+        return [
+            {"market id": market_id, "event id": self.args["eid"]}
+            for market_id in self._translated_list()
+        ]
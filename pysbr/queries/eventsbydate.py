@@ -17,6 +17,9 @@ class EventsByDate(Query):
             are those in the range [dt, dt + 24 hours].
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(self, league_ids: Union[List[int], int], dt: datetime):
         super().__init__()
@@ -1,6 +1,7 @@
-from datetime import datetime
-from typing import List, Union
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple, Union
 
+from pysbr.queries.batch import execute_concurrently
 from pysbr.queries.query import Query
 import pysbr.utils as utils
 
@@ -15,8 +16,15 @@ class EventsByDateRange(Query):
         league_ids: SBR league id or list of league ids.
         start: Python datetime object representing the start date to search.
         end: Python datetime object representing the end date to search.
+
+    For long ranges, such as whole seasons, use EventsByDateRange.chunked() or
+    EventsByDateRange.iter_chunked(), which split the range into smaller queries sent
+    concurrently.
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(
         self, league_ids: Union[List[int], int], start: datetime, end: datetime
@@ -38,3 +46,126 @@ class EventsByDateRange(Query):
         self._subpath_keys = ["events"]
         self._sublist_keys = ["participants", "scores"]
         self._id_key = "event id"
+
+    @classmethod
+    def _chunk_queries(
+        cls,
+        league_ids: Union[List[int], int],
+        start: datetime,
+        end: datetime,
+        chunk: timedelta,
+        per_league: bool,
+    ) -> Iterator["EventsByDateRange"]:
+        """Yield a deferred query for each chunk of the range [start, end].
+
+        Raises:
+            ValueError: If chunk is not positive.
+        """
+        if chunk <= timedelta(0):
+            raise ValueError("chunk must be a positive timedelta.")
+
+        league_ids = utils.make_list(league_ids)
+        groups = [[id] for id in league_ids] if per_league else [league_ids]
+        chunk_start = start
+        while True:
+            chunk_end = min(chunk_start + chunk, end)
+            for ids in groups:
+                yield cls.deferred(ids, chunk_start, chunk_end)
+            if chunk_end >= end:
+                return
+            chunk_start = chunk_end
+
+    @classmethod
+    def _iter_chunked_raw(
+        cls,
+        league_ids: Union[List[int], int],
+        start: datetime,
+        end: datetime,
+        chunk: timedelta,
+        max_workers: int,
+        per_league: bool,
+    ) -> Iterator[Tuple["EventsByDateRange", Dict]]:
+        """Yield each raw event in the range once, as the chunks holding it arrive.
+
+        Each event is yielded along with the query of its chunk.
+        """
+        seen = set()
+        queries = cls._chunk_queries(league_ids, start, end, chunk, per_league)
+        for q in execute_concurrently(queries, max_workers):
+            for event in q._find_data():
+                # Events on the boundary between chunks are returned by both.
+                if event["eid"] not in seen:
+                    seen.add(event["eid"])
+                    yield q, event
+
+    @classmethod
+    def chunked(
+        cls,
+        league_ids: Union[List[int], int],
+        start: datetime,
+        end: datetime,
+        chunk: timedelta = timedelta(days=7),
+        max_workers: int = 4,
+        per_league: bool = False,
+    ) -> "EventsByDateRange":
+        """Get events over a long range of dates, with many smaller queries.
+
+        The range is split into chunks of the given length, and optionally by league,
+        and the query for each chunk is sent concurrently (see
+        batch.execute_concurrently()). The events are merged, without duplicates, into
+        the response of the returned query, which is used like any other
+        EventsByDateRange.
+
+        The response to each chunk is cached as usual (see Query.cache), so if a chunk
+        fails, calling this method again only sends the queries that are missing.
+
+        Args:
+            league_ids: SBR league id or list of league ids.
+            start: Python datetime object representing the start date to search.
+            end: Python datetime object representing the end date to search.
+            chunk: The length of the range searched by each query.
+            max_workers: The max number of queries executing at once.
+            per_league: If True, each league is searched by its own queries.
+
+        Raises:
+            TypeError: If an argument does not match the expected type.
+            ValueError: If chunk is not positive, or max_workers is less than 1.
+            gql.Exception: If the server raises an error during execution of any of
+                the queries.
+        """
+        events = [
+            event
+            for _, event in cls._iter_chunked_raw(
+                league_ids, start, end, chunk, max_workers, per_league
+            )
+        ]
+        # Built without executing, to hold the merged response.
+        self = cls.deferred(utils.make_list(league_ids), start, end)
+        self._pending = None
+        self._raw = {self.name: {"events": events}}
+        return self
+
+    @classmethod
+    def iter_chunked(
+        cls,
+        league_ids: Union[List[int], int],
+        start: datetime,
+        end: datetime,
+        chunk: timedelta = timedelta(days=7),
+        max_workers: int = 4,
+        per_league: bool = False,
+    ) -> Iterator[Dict]:
+        """Iterate over the translated events in a long range of dates.
+
+        Works like EventsByDateRange.chunked(), but each event is translated and
+        yielded as soon as the chunk holding it has arrived, in chunk order, and no
+        chunk is kept after its events have been yielded. Events are yielded once,
+        even if several chunks return them.
+
+        Takes the same arguments, and raises the same exceptions, as
+        EventsByDateRange.chunked().
+        """
+        for q, event in cls._iter_chunked_raw(
+            league_ids, start, end, chunk, max_workers, per_league
+        ):
+            yield q._translate_element(event)
@@ -20,6 +20,9 @@ class EventsByEventGroup(Query):
             default market id for a given sport.
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(
         self, league_id: int, event_group_id: int, season_id: int, market_id: int
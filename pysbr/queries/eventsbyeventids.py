@@ -14,6 +14,9 @@ class EventsByEventIds(Query):
         event_ids: SBR event id or list of event ids.
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(self, event_ids: Union[List[int], int]):
         super().__init__()
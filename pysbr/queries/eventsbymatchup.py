@@ -23,6 +23,9 @@ class EventsByMatchup(Query):
             order from present.
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(self, participant_id1: int, participant_id2: int, count: int):
         super().__init__()
@@ -1,6 +1,7 @@
 from typing import Optional, List, Union, Tuple, Dict
 from datetime import datetime
 
+from pysbr.queries.eventstore import EventStore
 from pysbr.queries.query import Query
 import pysbr.utils as utils
 
@@ -17,6 +18,12 @@ class EventsByParticipants(Query):
 
     Because of the first query, either a league or sport id must be provided.
 
+    If an EventStore is assigned to EventsByParticipants.event_store, and it holds
+    every event of the league over the date range, the matching events are looked up
+    in the store instead of being filtered from the first query, which is skipped.
+    The full information of the matching events is still requested from the server,
+    and added to the store.
+
     All event queries return information about matching events including date and time,
     location, participants, and associated ids.
 
@@ -29,6 +36,10 @@ class EventsByParticipants(Query):
         sport_id: SBR sport id.
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+    event_store: Optional[EventStore] = None
+
     @Query.typecheck
     def __init__(
         self,
@@ -42,10 +53,47 @@ class EventsByParticipants(Query):
             raise ValueError("Either league_id or sport_id must not be None.")
 
         super().__init__()
-        utils.make_list(participant_ids)
-        event_ids = self._filter_events(
-            participant_ids, start, end, league_id, sport_id
-        )
+        self._participant_ids = utils.make_list(participant_ids)
+        self._events_filtered = False
+        store = self.event_store
+        if (
+            store is not None
+            and league_id is not None
+            and store.covers(league_id, start, end)
+        ):
+            self._events_filtered = True
+            event_ids = store.event_ids(
+                self._participant_ids, league_id=league_id, start=start, end=end
+            )
+            raw = self._events_query(event_ids)
+        else:
+            raw = self._filter_events_query(start, end, league_id, sport_id)
+        if raw is not None:
+            self._receive(raw)
+
+    def _receive(self, raw: Dict) -> None:
+        """Store the response to the pending query.
+
+        The first response is the list of all events over the date range, which is
+        filtered to build the second query, for the full information of the matching
+        events.
+        """
+        if self._events_filtered:
+            self._raw = raw
+            if self.event_store is not None:
+                self.event_store.add_events(self._find_data())
+            return
+
+        self._events_filtered = True
+        raw = self._events_query(self._filter_events(raw))
+        if raw is not None:
+            self._receive(raw)
+
+    def _events_query(self, event_ids: List[int]) -> Optional[Dict]:
+        """Make the query for the full information of the matching events.
+
+        None is returned if there are no matching events, or if the query is deferred.
+        """
         if not event_ids:
             return None
 
@@ -54,13 +102,12 @@ class EventsByParticipants(Query):
         # TODO
         self.args = {"eids": event_ids}
         self.fields = self._get_fields("event")
-        self._raw = self._build_and_execute_query(
-            self.name, self.fields, self.arg_str, self.args
-        )
-
         self._subpath_keys = ["events"]
         self._sublist_keys = ["participants", "scores"]
         self._id_key = "event id"
+        return self._build_and_execute_query(
+            self.name, self.fields, self.arg_str, self.args
+        )
 
     def _league_args(
         self, start: datetime, end: datetime, league_id: int
@@ -86,20 +133,14 @@ class EventsByParticipants(Query):
         }
         return q_arg_str, q_args
 
-    def _filter_events(
+    def _filter_events_query(
         self,
-        participant_ids: List[int],
         start: datetime,
         end: datetime,
         league_id: int,
         sport_id: int,
-    ) -> List[int]:
-        """Make a query to get all events, and then filter out the relevant ones.
-
-        The query gets all the events for a league or a sport over the given date range,
-        and then a list of ids of events including at least one participant in the list
-        is returned.
-        """
+    ) -> Optional[Dict]:
+        """Make a query to get all events for a league or sport over the date range."""
         q_name = "eventsV2"
         q_arg_str, q_args = (
             self._league_args(start, end, league_id)
@@ -107,16 +148,20 @@ class EventsByParticipants(Query):
             else self._sport_args(start, end, sport_id)
         )
         q_fields = self._get_fields("event_2")
-        raw = self._build_and_execute_query(q_name, q_fields, q_arg_str, q_args)
+        return self._build_and_execute_query(q_name, q_fields, q_arg_str, q_args)
 
-        # filter out relevant events
+    def _filter_events(self, raw: Dict) -> List[int]:
+        """Filter out the relevant events from the response to the first query.
+
+        A list of ids of events including at least one participant in the participant
+        id list is returned.
+        """
+        participant_ids = set(self._participant_ids)
         ids = []
         for e in raw["eventsV2"]["events"]:
             try:
-                event_pids = [p["partid"] for p in e["participants"]]
-                for pid in participant_ids:
-                    if pid in event_pids:
-                        ids.append(e["eid"])
+                if any(p["partid"] in participant_ids for p in e["participants"]):
+                    ids.append(e["eid"])
             except KeyError:
                 pass
 
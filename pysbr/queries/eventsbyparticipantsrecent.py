@@ -16,6 +16,9 @@ class EventsByParticipantsRecent(Query):
         participant_ids: SBR participant id or list of participant ids.
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(self, participant_ids: Union[List[int]]):
         # this query only gets the 5 most recent events for a participant.
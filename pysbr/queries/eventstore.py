@@ -0,0 +1,319 @@
+from datetime import datetime
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+from pysbr.queries.query import Query
+from pysbr.queries.translator import to_int
+import pysbr.utils as utils
+
+# Length of the range searched by EventsByDate, in milliseconds.
+_DAY = 24 * 60 * 60 * 1000
+
+
+class EventStore:
+    """Local store of events, indexed for lookups by participant, league and date.
+
+    Events are stored as returned by the server, in an SQLite database, along with the
+    date ranges each league has been fully stored for (its coverage). Populate the
+    store from events queries with add(), e.g. a season at a time:
+
+        store = EventStore("events.sqlite")
+        store.add(EventsByDateRange.chunked(league_id, season_start, season_end))
+
+    EventsByParticipants uses a store assigned to EventsByParticipants.event_store:
+    when the store covers the league and date range of the query, the matching events
+    are looked up locally, and only their full information is requested from the
+    server, instead of first downloading every event of the league in the range.
+    Newly requested events are added to the store.
+
+    Safe to share between threads. Several processes may use the same file.
+
+    Args:
+        path: Path of the database file. It is created if it doesn't exist.
+        max_age: Coverage recorded more than this many seconds ago is not used. If
+            None, coverage never expires, and events scheduled after a range was
+            stored are missed until the range is stored again.
+    """
+
+    def __init__(self, path: Union[str, Path], max_age: Optional[float] = None):
+        self.path = Path(path).expanduser()
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    eid INTEGER PRIMARY KEY,
+                    lid INTEGER,
+                    spid INTEGER,
+                    egid INTEGER,
+                    dt INTEGER,
+                    es TEXT,
+                    event TEXT NOT NULL,
+                    updated REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS events_lid_dt ON events (lid, dt);
+                CREATE INDEX IF NOT EXISTS events_spid_dt ON events (spid, dt);
+                CREATE INDEX IF NOT EXISTS events_egid ON events (egid);
+                CREATE INDEX IF NOT EXISTS events_dt ON events (dt);
+
+                CREATE TABLE IF NOT EXISTS event_participants (
+                    partid INTEGER NOT NULL,
+                    eid INTEGER NOT NULL,
+                    PRIMARY KEY (partid, eid)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS event_participants_eid
+                    ON event_participants (eid);
+
+                CREATE TABLE IF NOT EXISTS coverage (
+                    lid INTEGER NOT NULL,
+                    start INTEGER NOT NULL,
+                    end INTEGER NOT NULL,
+                    fetched REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS coverage_lid ON coverage (lid, start);
+
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    lid INTEGER PRIMARY KEY,
+                    watermark INTEGER NOT NULL,
+                    updated REAL NOT NULL
+                );
+                """
+            )
+
+    def add(self, query: Query) -> int:
+        """Store the events returned by an events query, and return their number.
+
+        The query must request the full information of each event, as all events
+        queries other than SearchEvents do. The ranges searched by EventsByDate and
+        EventsByDateRange are recorded as covered for their leagues. A query that
+        requested no events, such as EventsByParticipants when no event matches, adds
+        none.
+
+        Raises:
+            ValueError: If the query doesn't return the full information of events.
+        """
+        query.execute()
+        if query._raw is None:
+            return 0
+        if getattr(query, "fields", None) != query._get_fields("event"):
+            raise ValueError(f"{type(query).__name__} doesn't return full events.")
+        n = self.add_events(query._find_data())
+
+        args = query.args
+        if "timestamp" in args:
+            self.add_coverage(args["lids"], args["timestamp"], args["timestamp"] + _DAY)
+        elif "start" in args and "lids" in args:
+            self.add_coverage(args["lids"], args["start"], args["end"])
+        return n
+
+    def add_events(self, events: Iterable[Dict]) -> int:
+        """Store raw events, replacing stored events with the same ids.
+
+        Returns the number of events stored.
+        """
+        now = time.time()
+        rows = []
+        participants = []
+        for e in events:
+            eid = to_int(e["eid"])
+            group = e.get("eventGroup") or {}
+            rows.append(
+                (
+                    eid,
+                    to_int(e.get("lid")),
+                    to_int(e.get("spid")),
+                    to_int(group.get("egid")),
+                    to_int(e.get("dt")),
+                    e.get("es"),
+                    json.dumps(e),
+                    now,
+                )
+            )
+            for p in e.get("participants") or ():
+                participants.append((to_int(p["partid"]), eid))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "DELETE FROM event_participants WHERE eid = ?",
+                [(row[0],) for row in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO event_participants VALUES (?, ?)", participants
+            )
+        return len(rows)
+
+    def remove(self, event_ids: Iterable[int]) -> None:
+        """Remove the events with the given ids from the store."""
+        rows = [(eid,) for eid in event_ids]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM events WHERE eid = ?", rows)
+            self._conn.executemany(
+                "DELETE FROM event_participants WHERE eid = ?", rows
+            )
+
+    def add_coverage(
+        self, league_ids: Union[List[int], int], start: int, end: int
+    ) -> None:
+        """Record that all events of the leagues in [start, end] have been stored.
+
+        start and end are Unix timestamps in milliseconds.
+        """
+        now = time.time()
+        rows = [(id, start, end, now) for id in utils.make_list(league_ids)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO coverage VALUES (?, ?, ?, ?)", rows)
+
+    def covers(self, league_id: int, start: datetime, end: datetime) -> bool:
+        """Check whether all events of the league in [start, end] have been stored."""
+        start_ts = utils.datetime_to_timestamp(start)
+        end_ts = utils.datetime_to_timestamp(end)
+        oldest = 0 if self.max_age is None else time.time() - self.max_age
+        with self._lock:
+            ranges = self._conn.execute(
+                """
+                SELECT start, end FROM coverage
+                WHERE lid = ? AND fetched >= ? AND end >= ? AND start <= ?
+                ORDER BY start
+                """,
+                (league_id, oldest, start_ts, end_ts),
+            ).fetchall()
+
+        # Walk the ranges in order of start, extending the covered prefix.
+        covered = start_ts
+        for range_start, range_end in ranges:
+            if range_start > covered:
+                return False
+            covered = max(covered, range_end)
+            if covered >= end_ts:
+                return True
+        return covered >= end_ts
+
+    def watermark(self, league_id: int) -> Optional[int]:
+        """Get the watermark of the league, or None if it has none.
+
+        The watermark is a Unix timestamp in milliseconds, set by EventSync: the
+        stored events of the league starting before it are final, or no longer
+        expected to become final.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark FROM watermarks WHERE lid = ?", (league_id,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_watermark(self, league_id: int, watermark: int) -> None:
+        """Set the watermark of the league (see watermark())."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                (league_id, watermark, time.time()),
+            )
+
+    def event_ids(
+        self,
+        participant_ids: Optional[Union[List[int], int]] = None,
+        league_id: Optional[int] = None,
+        sport_id: Optional[int] = None,
+        event_group_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        all_participants: bool = False,
+        limit: Optional[int] = None,
+        latest_first: bool = False,
+    ) -> List[int]:
+        """Get the ids of stored events matching all the given filters, by date.
+
+        Args:
+            participant_ids: Only events in which one of these participants competed.
+            league_id: Only events in this league.
+            sport_id: Only events in this sport.
+            event_group_id: Only events in this event group.
+            start: Only events starting at or after this date.
+            end: Only events starting at or before this date.
+            all_participants: If True, only events in which all of participant_ids
+                competed, e.g. matchups between two teams.
+            limit: The max number of ids returned.
+            latest_first: If True, the most recent events come first.
+        """
+        where = []
+        params = []
+        if participant_ids is not None:
+            participant_ids = utils.make_list(participant_ids)
+            marks = ", ".join("?" * len(participant_ids))
+            having = len(participant_ids) if all_participants else 1
+            where.append(
+                f"""eid IN (
+                    SELECT eid FROM event_participants WHERE partid IN ({marks})
+                    GROUP BY eid HAVING COUNT(*) >= ?
+                )"""
+            )
+            params += [*participant_ids, having]
+        for column, value in [
+            ("lid", league_id),
+            ("spid", sport_id),
+            ("egid", event_group_id),
+        ]:
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            where.append("dt >= ?")
+            params.append(utils.datetime_to_timestamp(start))
+        if end is not None:
+            where.append("dt <= ?")
+            params.append(utils.datetime_to_timestamp(end))
+
+        sql = "SELECT eid FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY dt {'DESC' if latest_first else 'ASC'}, eid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def events(self, event_ids: Iterable[int]) -> List[Dict]:
+        """Get the stored raw events with the given ids, in the same order.
+
+        Ids of events that aren't stored are skipped.
+        """
+        event_ids = list(event_ids)
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's limit on the number of parameters.
+            for i in range(0, len(event_ids), 500):
+                chunk = event_ids[i:i + 500]
+                marks = ", ".join("?" * len(chunk))
+                for eid, event in self._conn.execute(
+                    f"SELECT eid, event FROM events WHERE eid IN ({marks})", chunk
+                ):
+                    found[eid] = event
+        return [json.loads(found[eid]) for eid in event_ids if eid in found]
+
+    def clear(self) -> None:
+        """Remove all events, coverage and watermarks from the store."""
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                DELETE FROM events;
+                DELETE FROM event_participants;
+                DELETE FROM coverage;
+                DELETE FROM watermarks;
+                """
+            )
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            self._conn.close()
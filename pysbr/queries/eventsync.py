@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from pysbr.queries.eventsbydaterange import EventsByDateRange
+from pysbr.queries.eventstore import EventStore
+from pysbr.queries.translator import to_int
+import pysbr.utils as utils
+
+# Statuses of events that won't change any more, once their scores are in.
+FINAL_STATUSES = frozenset(["complete", "canceled"])
+
+
+class EventSync:
+    """Keep the events of some leagues in an EventStore up to date, incrementally.
+
+    Each league has a watermark, kept in the store: every event of the league starting
+    before it is final, i.e. completed with its scores in (or canceled), and has been
+    for longer than settle. Such events are frozen, and never requested again. Each
+    run requests only the range from the watermark to the end of the synced range,
+    which holds the upcoming and in-progress events, and the recently completed
+    events whose scores may still be corrected. The watermark is then moved up to the
+    first event in that range that isn't frozen.
+
+    Events that still aren't final max_age after they start, e.g. postponed or
+    suspended events, or completed events whose scores never came in, are frozen as
+    they are, so that they don't hold the watermark back forever. A postponed event
+    that is rescheduled gets a new start time, and is picked up again if that is
+    after the watermark.
+
+    The first run requests the whole range, e.g. the season so far. Later runs, such
+    as an hourly job, request a few days of events:
+
+        sync = EventSync(EventStore("events.sqlite"), NFL().league_id, season_start)
+        sync.run()
+
+    Events in the requested range that the server no longer returns, e.g. events that
+    were rescheduled out of it, are removed from the store. The requested range is
+    recorded as covered in the store, so EventsByParticipants can use it.
+
+    Args:
+        store: The store holding the events and watermarks.
+        league_ids: SBR league id or list of league ids.
+        start: Python datetime object representing the start of the synced range.
+        end: Python datetime object representing the end of the synced range. If
+            None, the range ends lookahead after the time of each run.
+        lookahead: How far after the time of each run upcoming events are requested,
+            when end is None.
+        settle: How long after they start completed events are requested again, to
+            pick up score corrections.
+        max_age: How long after they start events that aren't final are requested
+            again. Should be longer than settle.
+        chunk: The length of the range searched by each query (see
+            EventsByDateRange.chunked()).
+        max_workers: The max number of queries executing at once.
+    """
+
+    def __init__(
+        self,
+        store: EventStore,
+        league_ids: Union[List[int], int],
+        start: datetime,
+        end: Optional[datetime] = None,
+        lookahead: timedelta = timedelta(days=14),
+        settle: timedelta = timedelta(days=2),
+        max_age: timedelta = timedelta(days=7),
+        chunk: timedelta = timedelta(days=7),
+        max_workers: int = 4,
+    ):
+        self.store = store
+        self.league_ids = utils.make_list(league_ids)
+        self.start = start
+        self.end = end
+        self.lookahead = lookahead
+        self.settle = settle
+        self.max_age = max_age
+        self.chunk = chunk
+        self.max_workers = max_workers
+
+    @staticmethod
+    def is_final(event: Dict) -> bool:
+        """Check whether the raw event is completed with its scores in, or canceled."""
+        status = event.get("es")
+        if status not in FINAL_STATUSES:
+            return False
+        return status != "complete" or bool(event.get("scores"))
+
+    def watermark(self, league_id: int) -> datetime:
+        """Get the start of the range the next run requests for the league."""
+        ts = self.store.watermark(league_id)
+        start = utils.datetime_to_timestamp(self.start)
+        return utils.timestamp_to_datetime(start if ts is None else max(ts, start))
+
+    def run(self, now: Optional[datetime] = None) -> Dict[int, int]:
+        """Request the events that can still change, and store them.
+
+        Args:
+            now: The time of the run. If None, the current time.
+
+        Returns:
+            The number of events requested for each league id.
+
+        Raises:
+            gql.Exception: If the server raises an error during execution of any of
+                the queries.
+        """
+        now = datetime.now() if now is None else now
+        end_ts = utils.datetime_to_timestamp(
+            now + self.lookahead if self.end is None else self.end
+        )
+        # Aware, like the watermarks.
+        end = utils.timestamp_to_datetime(end_ts)
+        # Events starting after this may still be in progress, or have their scores
+        # corrected.
+        settled_ts = utils.datetime_to_timestamp(now - self.settle)
+        # Events starting before this are frozen, even if they aren't final.
+        abandoned_ts = utils.datetime_to_timestamp(now - self.max_age)
+
+        counts = {}
+        for league_id in self.league_ids:
+            start = self.watermark(league_id)
+            start_ts = utils.datetime_to_timestamp(start)
+            if start_ts >= end_ts:
+                counts[league_id] = 0
+                continue
+
+            q = EventsByDateRange.chunked(
+                league_id, start, end, self.chunk, self.max_workers
+            )
+            events = q._find_data()
+            stale = set(
+                self.store.event_ids(league_id=league_id, start=start, end=end)
+            ).difference(to_int(e["eid"]) for e in events)
+            self.store.remove(stale)
+            self.store.add(q)
+            counts[league_id] = len(events)
+
+            watermark = min(settled_ts, end_ts)
+            for e in events:
+                dt = to_int(e.get("dt"))
+                if dt is not None and dt >= abandoned_ts and not self.is_final(e):
+                    watermark = min(watermark, dt)
+            self.store.set_watermark(league_id, max(watermark, start_ts))
+        return counts
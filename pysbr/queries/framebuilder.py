@@ -0,0 +1,144 @@
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from pysbr.queries.translator import DATETIME_KEYS
+
+
+class FrameBuilder:
+    """Build dataframes from translated query responses.
+
+    This replaces calling pd.json_normalize() on the response. Each element is walked
+    once, and its values are written straight into per-column lists: nested dicts are
+    flattened into columns named by their path, joined by '.', and the lists under
+    sublist keys (e.g. an event's participants) are spread over numbered columns, e.g.
+    'participants.1.participant id'. Columns are laid out in the same order as
+    pd.json_normalize() would lay them out.
+
+    Each column is then converted to the type given for its field in dtypes.yaml,
+    looked up by the last part of its name. Columns of fields that are not listed, or
+    whose values don't fit the listed type, keep the type inferred by pandas. Columns
+    of Unix timestamps, from queries with native datetimes, are converted to
+    datetime64[ns, UTC] in one step per column.
+
+    Builders are cached by the config registry; see Query._frame_builder().
+
+    Args:
+        dtypes: Map translated field names to pandas dtype names.
+    """
+
+    def __init__(self, dtypes: Mapping[str, str]):
+        self._dtypes = dtypes
+        # (prefix, keys of a dict) -> names of the columns holding each of its values,
+        # so names aren't rebuilt for every element.
+        self._plans: Dict[Tuple[str, Tuple[Hashable, ...]], List[str]] = {}
+
+    def _names(self, prefix: str, d: Dict) -> List[str]:
+        """Get the names of the columns holding the values of the dict d at prefix."""
+        keys = tuple(d)
+        names = self._plans.get((prefix, keys))
+        if names is None:
+            names = [f"{prefix}.{k}" if prefix else str(k) for k in keys]
+            self._plans[(prefix, keys)] = names
+        return names
+
+    def build(
+        self,
+        data: List[Any],
+        sublist_keys: Optional[Iterable[str]] = None,
+        timestamps: bool = False,
+    ) -> pd.DataFrame:
+        """Build a dataframe with a row for each element of data.
+
+        If the elements are not all dicts, a dataframe of the elements as they are is
+        returned.
+
+        Args:
+            data: The translated elements of a response.
+            sublist_keys: Keys whose values are lists to spread over numbered columns.
+            timestamps: Whether the values of DATETIME_KEYS fields are Unix timestamps
+                in milliseconds, rather than ISO strings.
+        """
+        if not all(isinstance(el, dict) for el in data):
+            return pd.DataFrame(data)
+
+        sublist_keys = tuple(sublist_keys or ())
+        n = len(data)
+        columns: Dict[str, List[Any]] = {}
+
+        for row, el in enumerate(data):
+            if sublist_keys:
+                el = self._spread(el, sublist_keys)
+
+            # pd.json_normalize() puts the top-level values that aren't dicts first.
+            nested = []
+            for name, v in zip(self._names("", el), el.values()):
+                if isinstance(v, dict):
+                    nested.append((name, v))
+                    continue
+                try:
+                    columns[name][row] = v
+                except KeyError:
+                    columns[name] = [None] * n
+                    columns[name][row] = v
+            for name, v in nested:
+                self._flatten(name, v, row, columns, n)
+
+        return pd.DataFrame(
+            {
+                name: self._convert(name, values, timestamps)
+                for name, values in columns.items()
+            },
+            index=pd.RangeIndex(n),
+        )
+
+    @staticmethod
+    def _spread(el: Dict, sublist_keys: Tuple[str, ...]) -> Dict:
+        """Replace the lists under sublist_keys with one item per list element.
+
+        The new items go after the others, keyed by f'{key}.{position}' counting from
+        1, as the lists were spread before being passed to pd.json_normalize().
+        """
+        spread = [k for k in sublist_keys if isinstance(el.get(k), list)]
+        if not spread:
+            return el
+        out = {k: v for k, v in el.items() if k not in spread}
+        for k in spread:
+            for i, sub in enumerate(el[k]):
+                out[f"{k}.{i+1}"] = sub
+        return out
+
+    def _flatten(
+        self, prefix: str, d: Dict, row: int, columns: Dict[str, List[Any]], n: int
+    ) -> None:
+        """Write the fields of the dict d, nested at prefix, to row of columns."""
+        for name, v in zip(self._names(prefix, d), d.values()):
+            if isinstance(v, dict):
+                self._flatten(name, v, row, columns, n)
+                continue
+            try:
+                columns[name][row] = v
+            except KeyError:
+                columns[name] = [None] * n
+                columns[name][row] = v
+
+    def _convert(self, name: str, values: List[Any], timestamps: bool) -> Any:
+        """Convert the values of the column name to the type of its field."""
+        field = name.rpartition(".")[2]
+        if timestamps and field in DATETIME_KEYS:
+            try:
+                times = pd.to_datetime(
+                    pd.array(values, dtype="Int64"), unit="ms", utc=True
+                )
+                # Newer pandas keep the unit of the input, here milliseconds.
+                return times.astype("datetime64[ns, UTC]").array
+            except (TypeError, ValueError):
+                pass
+        dtype = self._dtypes.get(field)
+        if dtype is not None:
+            try:
+                return pd.array(values, dtype=dtype)
+            except (TypeError, ValueError):
+                # e.g. a fractional number in a column of ids.
+                pass
+        return values
@@ -14,6 +14,8 @@ class LeagueHierarchy(Query):
         league_id: SBR league id.
     """
 
+    cache_ttl = 6 * 60 * 60
+
     @Query.typecheck
     def __init__(self, league_id: int):
         super().__init__()
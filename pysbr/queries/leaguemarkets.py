@@ -11,6 +11,9 @@ class LeagueMarkets(Query):
         league_id: SBR league id.
     """
 
+    cache_ttl = 6 * 60 * 60
+    _arrow_schema = "markets"
+
     @Query.typecheck
     def __init__(self, league_id: int):
         super().__init__()
@@ -1,7 +1,8 @@
-from typing import List, Union
+from typing import Dict, List, Union
 
 from pysbr.queries.lines import Lines
 from pysbr.queries.query import Query
+from pysbr.queries.scheduler import LOW
 import pysbr.utils as utils
 
 
@@ -23,6 +24,9 @@ class LineHistory(Lines):
         one participant id.
     """
 
+    cache_ttl = 60
+    priority = LOW
+
     @Query.typecheck
     def __init__(
         self,
@@ -49,6 +53,10 @@ class LineHistory(Lines):
             self.name, self.fields, self.arg_str, self.args
         )
 
+    def _response_ttl(self, raw: Dict) -> float:
+        lines = [line for el in raw[self.name] for line in el["lines"]]
+        return self._history_ttl(lines)
+
     def _find_data(self):
         lines = self._raw[self.name]
         cleaned_lines = []
@@ -0,0 +1,119 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type
+
+from pysbr.queries.lines import Lines
+from pysbr.queries.translator import to_int
+import pysbr.utils as utils
+
+# Delta kinds.
+INSERTED = "inserted"
+CHANGED = "changed"
+REMOVED = "removed"
+
+# SBR field names identifying a line, and of the values compared between polls.
+KEY_FIELDS = ("eid", "mtid", "paid", "partid")
+VALUE_FIELDS = ("adj", "pri", "ap")
+
+# Translated names of the compared values, as in Lines.list().
+VALUE_NAMES = ("spread / total", "decimal odds", "american odds")
+
+
+def _value(line: Dict, k: str) -> Any:
+    """Get field k of the raw line, converted as translation converts it."""
+    return to_int(utils.line_value(line, k))
+
+
+class LinePoller:
+    """Poll a lines query, reporting only the lines that changed since the last poll.
+
+    The poller keeps the lines of the last response, keyed by event id, market id,
+    sportsbook id and participant id. Each poll sends the query again, and compares
+    the spread / total, decimal odds and American odds of each line in the new
+    response with the line under the same key in the last one, e.g.
+
+        poller = LinePoller(CurrentLines, event_ids, market_ids, sportsbook_ids)
+        poller.poll()  # Every line is inserted.
+        while True:
+            time.sleep(5)
+            for delta in poller.poll():
+                ...
+
+    Lines are compared in the raw response, so only the lines that changed are
+    translated. Values are converted as translation converts them before they are
+    compared, so e.g. odds returned as a string in one response and as a number in
+    the next are not reported as changed. Each delta is the translated line, as in
+    Lines.list(), with 'change' set to 'inserted', 'changed' or 'removed', and the
+    previous values of the compared fields, converted the same way, under
+    'old spread / total', 'old decimal odds' and 'old american odds' (None for
+    inserted lines). A removed line is the line from the last response in which it
+    appeared.
+
+    Args:
+        query_cls: The lines query to poll, usually CurrentLines or BestLines.
+        args: The arguments of query_cls.
+    """
+
+    def __init__(self, query_cls: Type[Lines], *args: Any):
+        self.query_cls = query_cls
+        self.args = args
+        self._lines: Dict[Tuple[Hashable, ...], Dict] = {}
+        self._query: Optional[Lines] = None
+
+    def __len__(self) -> int:
+        """Get the number of lines in the last response."""
+        return len(self._lines)
+
+    def poll(self) -> List[Dict]:
+        """Send the query, and return the lines that changed since the last poll.
+
+        Raises:
+            gql.Exception: If the server raises an error during execution of the query.
+        """
+        return self.update(self.query_cls(*self.args))
+
+    def update(self, query: Lines) -> List[Dict]:
+        """Take the response to query as the newest one, and return the changes.
+
+        Useful to feed the poller responses fetched by other means, e.g. executed
+        concurrently with other queries, or asynchronously.
+        """
+        query.execute()
+        lines = {}
+        for line in query._find_data():
+            lines[tuple(_value(line, k) for k in KEY_FIELDS)] = line
+
+        deltas = []
+        old_lines = self._lines
+        for key, line in lines.items():
+            old = old_lines.get(key)
+            if old is None:
+                deltas.append(self._delta(query, INSERTED, line, None))
+                continue
+            if any(_value(line, k) != _value(old, k) for k in VALUE_FIELDS):
+                deltas.append(self._delta(query, CHANGED, line, old))
+        for key, old in old_lines.items():
+            if key not in lines:
+                deltas.append(self._delta(query, REMOVED, old, old))
+
+        self._lines = lines
+        self._query = query
+        return deltas
+
+    @staticmethod
+    def _delta(query: Lines, change: str, line: Dict, old: Optional[Dict]) -> Dict:
+        """Build the delta reporting a change to the raw line."""
+        delta = query._translate_element(line)
+        delta["change"] = change
+        for k, name in zip(VALUE_FIELDS, VALUE_NAMES):
+            delta[f"old {name}"] = None if old is None else _value(old, k)
+        return delta
+
+    def lines(self) -> List[Dict]:
+        """Get the translated lines of the last response."""
+        if self._query is None:
+            return []
+        return [self._query._translate_element(line) for line in self._lines.values()]
+
+    def reset(self) -> None:
+        """Forget the last response, so the next poll reports every line inserted."""
+        self._lines = {}
+        self._query = None
@@ -1,8 +1,14 @@
-import copy
-from typing import List, Dict, Union, Tuple
+from collections import ChainMap
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Dict, Mapping, Optional, Union, Tuple
 
+import numpy as np
 import pandas as pd
 
+from pysbr.queries.eventindex import EventIndex
+from pysbr.queries.eventstore import EventStore
+from pysbr.queries.linetable import LineTable
 from pysbr.queries.query import Query
 from pysbr.config.sport import (
     NFL,
@@ -30,6 +36,17 @@ from pysbr.config.sport import (
 )
 from pysbr.config.sport import Sport
 from pysbr.config.sportsbook import Sportsbook
+from pysbr.config.registry import registry
+from pysbr.queries.cache import FOREVER
+from pysbr.queries.translator import to_int
+import pysbr.utils as utils
+
+
+# these are the participant ids for Over/Under lines for all sports I checked
+OVER_UNDER = {15143: "over", 15144: "under"}
+
+# Statuses of events that are over.
+FINAL_STATUSES = frozenset(["complete", "canceled"])
 
 
 class Lines(Query):
@@ -37,8 +54,36 @@ class Lines(Query):
 
     This class should not be directly instantiated; use the subclasses defined for each
     lines-related query.
+
+    Attributes:
+        settled_age (float): Lines histories whose most recent line is older than this
+            many seconds are cached forever, once their events are known to be over.
+        event_store (Optional[EventStore]): If set, the statuses of the events of
+            lines histories are looked up in it, to decide how long to cache them.
     """
 
+    settled_age: float = 2 * 24 * 60 * 60
+    event_store: Optional[EventStore] = None
+
+    # Lines-related queries don't accept any fields, so some unneeded fields are
+    # returned. They are removed during translation.
+    _dropped_keys = (
+        "boid",
+        "lineid",
+        "sequence",
+        "dp",
+        "bs",
+        "iof",
+        "sbid",
+        "sid",
+        "fpd",
+        "fpn",
+        "sort",
+    )
+    # ConsensusHistory has 'line' as a key, instead of being the top-level dictionary.
+    _drop_within = "line"
+    _arrow_schema = "lines"
+
     def __init__(self):
         self._events = None
         self._event_descriptions = {}
@@ -47,8 +92,7 @@ class Lines(Query):
         self._event_scores = {}
         self._event_statuses = {}
 
-        # these are the participant ids for Over/Under lines for all sports I checked
-        self._participants = {15143: "over", 15144: "under"}
+        self._participants = OVER_UNDER
         self._participants_full = {}
 
         self._leagues = {
@@ -82,43 +126,86 @@ class Lines(Query):
         self._sportsbooks = None
 
         self._with_ids_translated = None
+        self._with_ids_events = None
+        self._with_ids_source = None
+
+        # The table of the response in _table_raw; see table().
+        self._table = None
+        self._table_raw = None
+
+        # Whether the response has been stored forever; see _cache_if_over().
+        self._cached_forever = False
 
         super().__init__()
 
-    def _clean_lines(self, data: List[Dict]) -> List[Dict]:
-        """Remove unneeded keys from the query response.
+    def _history_ttl(self, lines: List[Dict]) -> float:
+        """Get how long a lines history response may be cached for.
 
-        This is necessary for lines-related queries because they don't accept any
-        fields, so some unneeded fields are returned.
+        lines are the lines in the response. Once a market closes its history no
+        longer changes, so the response is cached forever if its most recent line is
+        older than self.settled_age, and the events of its lines are known to be over
+        (see self._events_over()). A line that hasn't moved lately may just be for an
+        upcoming event, so otherwise the response is cached for self.cache_ttl.
         """
-        to_remove = [
-            "boid",
-            "lineid",
-            "sequence",
-            "dp",
-            "bs",
-            "iof",
-            "sbid",
-            "sid",
-            "fpd",
-            "fpn",
-            "sort",
-        ]
-        for term in to_remove:
-            for line in data:
-                try:
-                    # ConsensusHistory has 'line' as a key, instead of being the
-                    # top-level dictionary.
-                    line = line["line"]
-                except KeyError:
-                    pass
-                try:
-                    # The earliest (time-wise) lines in consensusHistory may not have
-                    # 'line' as a key.
-                    line.pop(term, None)
-                except AttributeError:
-                    pass
-        return data
+        times = [to_int(line.get("tim")) for line in lines]
+        times = [t for t in times if t is not None]
+        now = utils.datetime_to_timestamp(datetime.now())
+        if not times or now - max(times) <= self.settled_age * 1000:
+            return self.cache_ttl
+
+        event_ids = sorted({line["eid"] for line in lines if line.get("eid")})
+        if event_ids and self._events_over(event_ids, max(times)):
+            return FOREVER
+        return self.cache_ttl
+
+    def _events_over(self, event_ids: List[int], last_line: int) -> bool:
+        """Check whether the events are known to be over, without sending a request.
+
+        An event is over if it is completed or canceled, or if it started before the
+        time of the most recent line, last_line. Statuses and start times are taken
+        from self.event_store, and statuses from the executed events passed to
+        self.list() and the like. Events found in neither are assumed not to be over.
+        """
+        statuses = {}
+        starts = {}
+        if self.event_store is not None:
+            for e in self.event_store.events(event_ids):
+                eid = to_int(e.get("eid"))
+                statuses[eid] = e.get("es")
+                starts[eid] = to_int(e.get("dt"))
+        events = self._events
+        if isinstance(events, EventIndex) or (
+            events is not None and events.is_executed()
+        ):
+            statuses.update(EventIndex.of(events).statuses)
+
+        for eid in event_ids:
+            eid = to_int(eid)
+            start = starts.get(eid)
+            if statuses.get(eid) in FINAL_STATUSES:
+                continue
+            if start is not None and start <= last_line:
+                continue
+            return False
+        return True
+
+    def _cache_if_over(self) -> None:
+        """Store the response forever, if its events are now known to be over.
+
+        A history stored while the statuses of its events were unknown is cached for
+        self.cache_ttl only. This is called once events are passed in, and stores it
+        again if that makes it settled (see self._history_ttl()).
+        """
+        if (
+            self._cached_forever
+            or self._raw is None
+            or not self.cache_ttl
+            or (self.cache is None and self.memory_cache is None)
+        ):
+            return
+        if self._response_ttl(self._raw) == FOREVER:
+            self._set_cached(self._query_string, self._raw)
+            self._cached_forever = True
 
     def _init_config(self, data: List[Dict]) -> None:
         """Initialize private instance variables.
@@ -127,68 +214,32 @@ class Lines(Query):
         ids to information. This method does that.
 
         self._leagues and self._sports map league and sport ids to their configuration
-        classes. Other private instance variables map event and participant ids to their
-        translations.
+        classes, whose shared instances (see ConfigRegistry.instance()) are stored in
+        self._leagues_init and self._sports_init. Other private instance variables map
+        event and participant ids to their translations; they are views of the events'
+        EventIndex, which is shared rather than rebuilt for every call.
         """
-        # TODO: All these Dict.get() calls are unnecessary because the GQL query
-        # structure should have key with empty string at least.
-        # GraphQL types implementing an interface are guaranteed to implement those
-        # fields.
         if self._sportsbooks is None:
-            self._sportsbooks = Sportsbook().names
+            self._sportsbooks = registry.instance(Sportsbook).names
 
-        league_ids = [e.get("league id") for e in self._events.list()]
-        for id in set(league_ids):
-            try:
-                self._leagues_init[id] = self._leagues[id]()
-            except KeyError:
-                pass
+        index = EventIndex.of(self._events)
+        self._cache_if_over()
 
-        sport_ids = [e.get("sport id") for e in self._events.list()]
-        for id in set(sport_ids):
-            try:
-                self._sports_init[id] = self._sports[id]()
-            except KeyError:
-                pass
-
-        for e in self._events.list():
-            self._event_descriptions[e.get("event id")] = e.get("description")
-            self._event_leagues[e.get("event id")] = e.get("league id")
-            self._event_sports[e.get("event id")] = e.get("sport id")
-            self._event_scores[e.get("event id")] = e.get("scores")
-            self._event_statuses[e.get("event id")] = e.get("event status")
-
-            for p in e["participants"]:
-                participant_id = p["participant id"]
-                source = p["source"]
-
-                if "abbreviation" in source:
-                    # case 1, team: abbr, full name
-                    self._participants[participant_id] = source["abbreviation"]
-                    # Using short name instead of location because SearchEvents don't
-                    # have location. Also college sports use short name.
-                    short_name = source["short name"]
-                    nickname = source["nickname"]
-                    if short_name and nickname:
-                        # American leagues have these filled out.
-                        self._participants_full[
-                            participant_id
-                        ] = f"{short_name} {nickname}"
-                    else:
-                        # Other leagues should have full name available.
-                        self._participants_full[participant_id] = source["name"]
-
-                elif "last name" in source:
-                    # case 2, individual: lname, full name
-                    fname = source["first name"]
-                    lname = source["last name"]
-                    self._participants[participant_id] = lname
-                    self._participants_full[participant_id] = f"{fname} {lname}"
-
-                elif "participant group id" in source:
-                    # case 3, pairs (eg doubles tennis): None, full name
-                    self._participants[participant_id] = None
-                    self._participants_full[participant_id] = source["name"]
+        for id in index.league_ids:
+            if id in self._leagues and id not in self._leagues_init:
+                self._leagues_init[id] = registry.instance(self._leagues[id])
+
+        for id in index.sport_ids:
+            if id in self._sports and id not in self._sports_init:
+                self._sports_init[id] = registry.instance(self._sports[id])
+
+        self._event_descriptions = index.descriptions
+        self._event_leagues = index.leagues
+        self._event_sports = index.sports
+        self._event_scores = index.scores
+        self._event_statuses = index.statuses
+        self._participants = ChainMap(index.participants, OVER_UNDER)
+        self._participants_full = index.participants_full
 
     def _get_config(self, line: List[Dict]) -> Sport:
         """Get league or sport config class.
@@ -226,7 +277,7 @@ class Lines(Query):
         If the market is a total, the return is of the form (total, []). Otherwise, the
         return looks like (points_scored_by_team, points_scored_by_other_team).
         """
-        scores = copy.deepcopy(period_scores)
+        scores = period_scores
         # TODO: check that len scores == market range (current and future events)
         if market_range is not None:
             scores = [s for s in period_scores if s.get("period") in market_range]
@@ -308,7 +359,7 @@ class Lines(Query):
                 line.get("market id")
             )
         except AttributeError:
-            return
+            return None, None, None
 
         try:
             market_range = list(range(market_periods[0], market_periods[-1]))
@@ -332,6 +383,209 @@ class Lines(Query):
 
         return ("W" if is_win else "L", profit, points)
 
+    def _market_info(
+        self, pairs: pd.DataFrame
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Look up the config of each (event id, market id) pair in pairs.
+
+        Returns whether a config exists for the event, whether the market is a total,
+        and the bounds of the market's period range (NaN if the market has no periods).
+        """
+        has_config, is_total, low, high = [], [], [], []
+        for eid, mid in zip(pairs["eid"], pairs["mid"]):
+            config = self._get_config({"event id": eid})
+            has_config.append(config is not None)
+            if config is None:
+                is_total.append(False)
+                low.append(np.nan)
+                high.append(np.nan)
+                continue
+            is_total.append(config.market_types.get(mid) == "total")
+            periods = config.market_periods.get(mid)
+            try:
+                low.append(periods[0])
+                high.append(periods[-1])
+            except TypeError:
+                low.append(np.nan)
+                high.append(np.nan)
+        return (
+            np.array(has_config, dtype=bool),
+            np.array(is_total, dtype=bool),
+            np.array(low, dtype=float),
+            np.array(high, dtype=float),
+        )
+
+    def _event_scores_frame(self, event_ids) -> pd.DataFrame:
+        """Build a table of the period scores of the completed events in event_ids."""
+        rows = []
+        for eid in event_ids:
+            scores = self._event_scores.get(eid)
+            if not scores or self._event_statuses.get(eid) != "complete":
+                continue
+            for s in scores:
+                rows.append(
+                    (
+                        eid,
+                        s.get("period"),
+                        s.get("participant id"),
+                        s.get("points scored"),
+                    )
+                )
+        scores = pd.DataFrame(rows, columns=["eid", "period", "pid", "points"])
+        scores["period"] = pd.to_numeric(scores["period"], errors="coerce")
+        scores["points"] = pd.to_numeric(scores["points"], errors="coerce")
+        scores["null"] = scores["points"].isna()
+        return scores
+
+    def _resolve_bets(
+        self, data: List[Dict]
+    ) -> List[Tuple[Optional[str], Optional[float], Optional[int]]]:
+        """Determine the result of every line in data at once.
+
+        Gives the same results as calling self._resolve_bet() on each line, but joins
+        the lines to the event scores and market configs as arrays, so that the work
+        per line is a few vectorized operations. Lines missing a value needed to grade
+        them (spread / total, or decimal odds of a winning bet) are left ungraded.
+        """
+        if not data:
+            return []
+
+        keys = {
+            "event id": "eid",
+            "market id": "mid",
+            "participant id": "pid",
+            "spread / total": "spread",
+            "decimal odds": "odds",
+        }
+        lines = pd.DataFrame(data, columns=list(keys)).rename(columns=keys)
+        spread = pd.to_numeric(lines.pop("spread"), errors="coerce").to_numpy(float)
+        odds = pd.to_numeric(lines.pop("odds"), errors="coerce").to_numpy(float)
+
+        scores = self._event_scores_frame(lines["eid"].unique())
+        by_event = scores.groupby("eid")
+        event_points = by_event["points"].sum()
+        event_null = by_event["null"].any()
+        participant_points = scores.groupby(["eid", "pid"])["points"].sum()
+
+        # Config lookups are done once per (event, market) pair.
+        pairs = lines[["eid", "mid"]].drop_duplicates(ignore_index=True)
+        has_config, is_total, low, high = self._market_info(pairs)
+        pairs["has_config"] = has_config
+        pairs["is_total"] = is_total
+        pairs["low"] = low
+        pairs["high"] = high
+
+        # Points scored by all participants over each market's period range.
+        ranged = pairs.loc[~np.isnan(low), ["eid", "low", "high"]].drop_duplicates()
+        ranged = ranged.merge(scores, on="eid")
+        period = ranged["period"]
+        in_range = (period >= ranged["low"]) & (period < ranged["high"])
+        ranged = ranged[in_range].groupby(["eid", "low", "high"])
+        range_totals = pd.DataFrame(
+            {"range_points": ranged["points"].sum(), "range_null": ranged["null"].any()}
+        )
+        pairs = pairs.merge(
+            range_totals.reset_index(),
+            on=["eid", "low", "high"],
+            how="left",
+        )
+        lines = lines.merge(pairs, on=["eid", "mid"], how="left")
+
+        graded_event = lines["eid"].isin(event_points.index).to_numpy()
+        all_points = lines["eid"].map(event_points).to_numpy(dtype=float)
+        all_null = lines["eid"].map(event_null).fillna(True).to_numpy(dtype=bool)
+        has_range = ~np.isnan(lines["low"].to_numpy(dtype=float))
+        range_points = lines["range_points"].fillna(0).to_numpy(dtype=float)
+        range_null = lines["range_null"].fillna(False).to_numpy(dtype=bool)
+
+        # Over / under lines count the points of all participants over the market's
+        # periods. Other lines count the participant's points against everyone
+        # else's, over the whole event.
+        pid = lines["pid"]
+        is_over = (pid == 15143).to_numpy()
+        is_under = (pid == 15144).to_numpy()
+        is_ou = is_over | is_under
+        own_points = (
+            pd.Series(list(zip(lines["eid"], pid)), dtype=object)
+            .map(participant_points)
+            .fillna(0)
+            .to_numpy(dtype=float)
+        )
+        points = np.where(
+            is_ou, np.where(has_range, range_points, all_points), own_points
+        )
+        o_points = np.where(is_ou, 0, all_points - own_points)
+        null = np.where(is_ou & has_range, range_null, all_null)
+
+        market_total = lines["is_total"].fillna(False).to_numpy(dtype=bool)
+        with np.errstate(invalid="ignore"):
+            is_win = np.where(
+                market_total,
+                (is_over & (points > spread)) | (is_under & (points < spread)),
+                points + spread > o_points,
+            )
+
+        graded = (
+            graded_event
+            & lines["has_config"].fillna(False).to_numpy(dtype=bool)
+            & ~null
+            & ~np.isnan(spread)
+            & ~(is_win & np.isnan(odds))
+        )
+
+        # Profits are rounded with round(), as in self._resolve_bet(), since
+        # np.round() rounds some halves differently.
+        return [
+            (
+                ("W", round((o - 1) * 100, 2), int(p) if p.is_integer() else p)
+                if w
+                else ("L", -100.0, int(p) if p.is_integer() else p)
+            )
+            if g
+            else (None, None, None)
+            for g, w, p, o in zip(
+                graded.tolist(), is_win.tolist(), points.tolist(), odds.tolist()
+            )
+        ]
+
+    def _add_info(self, line: Dict, bet: Tuple) -> Dict:
+        """Add the information about the ids of line to it, and return it.
+
+        bet is the (result, profit, points) of the line, from self._resolve_bet() or
+        self._resolve_bets(). self._init_config() must have been called first.
+        """
+        result, profit, points = bet
+        line["event"] = self._event_descriptions.get(line.get("event id"))
+        market = self._resolve_market(line)
+        if market is not None:
+            line["market"] = market
+        if result is not None:
+            line["result"] = result
+        if profit is not None:
+            line["profit"] = profit
+        if points is not None:
+            line["participant score"] = points
+
+        sb_names = self._sportsbooks.get(line.get("sportsbook id"))
+        if sb_names is not None:
+            line["sportsbook"] = sb_names[0]
+            # Slicing out of range does not raise error.
+            for i, name in enumerate(sb_names[1:]):
+                alias = "sportsbook alias"
+                if i == 0:
+                    line[alias] = name
+                else:
+                    line[f"{alias} {i+1}"] = name
+        else:
+            # BestLines may return sportsbooks that aren't active on SBR.
+            line["sportsbook"] = "N/A"
+
+        line["participant"] = self._participants.get(line.get("participant id"))
+        line["participant full name"] = self._participants_full.get(
+            line.get("participant id")
+        )
+        return line
+
     def _translate_ids(self, data: List[Dict]) -> List[Dict]:
         """Add new entries to each element in the list for the element's id fields.
 
@@ -350,72 +604,59 @@ class Lines(Query):
             participant information
             bet result information (whether it won or lost; only for completed events)
 
-        self._with_ids_translated caches the returned list.
+        data is the shared translation, which is not modified; each line is copied
+        before adding entries. self._with_ids_translated caches the returned list for
+        the events it was built with.
         """
         if self._events is None:
             return data
 
-        if self._with_ids_translated is not None:
+        if (
+            self._with_ids_translated is not None
+            and self._with_ids_events is self._events
+            and self._with_ids_source is data
+        ):
             return self._with_ids_translated
 
         self._init_config(data)
 
-        for line in data:
-            line["event"] = self._event_descriptions.get(line.get("event id"))
-            market = self._resolve_market(line)
-            if market is not None:
-                line["market"] = market
-            result, profit, points = self._resolve_bet(line)
-            if result is not None:
-                line["result"] = result
-            if profit is not None:
-                line["profit"] = profit
-            if points is not None:
-                line["participant score"] = points
-
-            sb_names = self._sportsbooks.get(line.get("sportsbook id"))
-            if sb_names is not None:
-                line["sportsbook"] = sb_names[0]
-                # Slicing out of range does not raise error.
-                for i, name in enumerate(sb_names[1:]):
-                    alias = "sportsbook alias"
-                    if i == 0:
-                        line[alias] = name
-                    else:
-                        line[f"{alias} {i+1}"] = name
-            else:
-                # BestLines may return sportsbooks that aren't active on SBR.
-                line["sportsbook"] = "N/A"
-
-            line["participant"] = self._participants.get(line.get("participant id"))
-            line["participant full name"] = self._participants_full.get(
-                line.get("participant id")
-            )
+        source = data
+        data = [dict(line) for line in data]
+        bets = self._resolve_bets(data)
+        for line, bet in zip(data, bets):
+            self._add_info(line, bet)
 
+        self._with_ids_source = source
         self._with_ids_translated = data
+        self._with_ids_events = self._events
         return data
 
-    def _copy_and_translate_data(self) -> List[Dict]:
-        """Translate SBR fields in GraphQL response, and return a copy.
+    def _translated_data(self) -> List[Dict]:
+        """Get the translated data, with ids translated if events have been passed.
 
-        This method is used by self.list() and self.dataframe(). Overrides Query.
-        _copy_and_translate_data() in order to add steps for cleaning the response and
-        translating the ids in the response.
+        Overrides Query._translated_data() in order to add the step translating the ids
+        in the response.
         """
-        data = copy.deepcopy(self._find_data())
-        self._clean_lines(data)
-        self._translate_dict(data)
-        return self._translate_ids(data)
+        return self._translate_ids(super()._translated_data())
 
-    def list(self, events=None) -> List[Dict[str, Union[str, List, Dict]]]:
+    def list(
+        self, events=None, readonly: bool = False
+    ) -> Union[List[Dict[str, Union[str, List, Dict]]], Tuple[Mapping, ...]]:
         """Get a list of translated elements returned from the query.
 
         If a list of events the lines are for is passed in, extra information about
         each line will be added to each element of the returned list, including event
         description, participant information, and betting market name.
+
+        events may be an events query or its EventIndex. The index of an events query
+        is built once and reused, so the same events can be passed to many lines
+        queries cheaply.
+
+        If readonly is True, a read-only view shared between calls is returned instead
+        of a copy. See Query.list().
         """
         self._events = events
-        return super().list()
+        return super().list(readonly)
 
     def dataframe(self, events=None) -> pd.DataFrame:
         """Get a dataframe of elements returned from the query.
@@ -423,6 +664,62 @@ class Lines(Query):
         If a list of events the lines are for is passed in, extra information about
         each line will be added to each row of the returned dataframe, including event
         description, participant information, and betting market name.
+
+        events may be an events query or its EventIndex; see self.list().
         """
         self._events = events
         return super().dataframe()
+
+    def iter_lines(self, events=None) -> Iterator[Dict]:
+        """Iterate over the translated lines returned from the query, one at a time.
+
+        Like self.iter_rows(), each line is translated from the raw response as it is
+        yielded. If the events the lines are for are passed in, the extra information
+        described in self.list() is added to each line as it is yielded, and its bet
+        is resolved on its own rather than with all the others.
+
+        events may be an events query or its EventIndex.
+        """
+        lines = self.iter_rows()
+        if events is None:
+            return lines
+        self._events = events
+        self._init_config([])
+        return (self._add_info(line, self._resolve_bet(line)) for line in lines)
+
+    def to_arrow(self, events=None):
+        """Get an Apache Arrow table of the lines returned from the query.
+
+        If a list of events the lines are for is passed in, the columns with extra
+        information about each line are filled in; see self.list(). Requires pyarrow.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        self._events = events
+        return super().to_arrow()
+
+    def to_parquet(self, path: Union[str, Path], events=None, **kwargs) -> None:
+        """Write the lines returned from the query to a Parquet file.
+
+        events is handled as in self.to_arrow(); see Query.to_parquet().
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        self._events = events
+        super().to_parquet(path, **kwargs)
+
+    def table(self) -> LineTable:
+        """Get a compact, columnar table of the lines returned from the query.
+
+        The table is built from the raw response, without translating it, and is
+        cached until the response changes. It holds the lines in NumPy arrays at a
+        fraction of the memory of list() or dataframe(), so prefer it for large line
+        histories. See LineTable.
+        """
+        self.execute()
+        if self._table is None or self._table_raw is not self._raw:
+            self._table = LineTable(self._find_data(), self._dropped_keys)
+            self._table_raw = self._raw
+        return self._table
@@ -0,0 +1,248 @@
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from pysbr.config.registry import registry
+import pysbr.utils as utils
+
+# Value stored in integer columns where the response has no value.
+MISSING = np.iinfo(np.int64).min
+
+# Column kinds.
+INT = "int"
+FLOAT = "float"
+CATEGORY = "category"
+
+# (SBR field name, column name, kind) of the columns every line table has. Market,
+# sportsbook and participant ids repeat on many lines, so they are stored as codes
+# into an array of their distinct values. Timestamps are in milliseconds.
+COLUMNS = (
+    ("eid", "event id", INT),
+    ("mtid", "market id", CATEGORY),
+    ("paid", "sportsbook id", CATEGORY),
+    ("partid", "participant id", CATEGORY),
+    ("adj", "spread / total", FLOAT),
+    ("pri", "decimal odds", FLOAT),
+    ("ap", "american odds", FLOAT),
+    ("tim", "datetime", INT),
+)
+
+# SBR field names that are never stored, in addition to those Lines drops.
+_SKIPPED = frozenset(["line"])
+
+
+def _ints(values: List[Any]) -> np.ndarray:
+    """Build an int64 array from values, storing MISSING for None or non-integers."""
+    try:
+        a = np.array(values)
+    except (TypeError, ValueError):
+        a = None
+    if a is not None and a.dtype.kind == "i":
+        return a.astype(np.int64, copy=False)
+    # Some values are None, floats, or integers held in strings. Floats with a
+    # fraction are not integers, rather than being truncated.
+    s = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    s = s.where(s == s.round())
+    return s.fillna(MISSING).to_numpy(dtype=np.int64)
+
+
+def _floats(values: List[Any]) -> np.ndarray:
+    """Build a float64 array from values, storing NaN for None or non-numbers."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        s = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+        return s.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _encode(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split the int64 array ids into int32 codes and the sorted distinct ids.
+
+    Missing ids get the code -1, as in pandas.Categorical.
+    """
+    present = ids != MISSING
+    categories, inverse = np.unique(ids[present], return_inverse=True)
+    codes = np.full(len(ids), -1, dtype=np.int32)
+    codes[present] = inverse
+    return codes, categories
+
+
+class LineTable:
+    """Compact, columnar table of betting lines.
+
+    Lines queries return their lines as one dict per line, which costs about a
+    kilobyte per line once translated. A line table holds the same lines in NumPy
+    arrays, one per field, at less than a tenth of that: ids, odds, spreads / totals
+    and timestamps are stored as numbers, and the market, sportsbook and participant
+    ids of each line as codes into the array of distinct ids in that column.
+
+    The table is built straight from the raw response of a Lines query, without
+    translating it, so the query can be discarded once its table is built. Build it
+    with LineTable.of(lines) or lines.table(), e.g.
+
+        table = LineHistory(event_id, market_id, sportsbook_id, participant_ids).table()
+        odds = table["decimal odds"]
+        best = table[odds == odds.max()].list()
+
+    Every table has the columns in COLUMNS. ConsensusHistory lines also have their
+    other numeric fields (wagers, percentage, volume and total volume) as float
+    columns. Integer columns store MISSING, and float columns NaN, where a line has
+    no value. Timestamps are kept in milliseconds.
+
+    Indexing the table by a column name returns that column, with categorical columns
+    decoded into ids; indexing it by anything NumPy accepts as an index (slice, mask,
+    array of positions) returns a new table of the selected lines.
+
+    Args:
+        lines: The lines, as returned by the server (see Query.raw()), e.g. the
+            elements of a CurrentLines response.
+        skip: SBR field names that are not stored, even if their values are numbers.
+            LineTable.of() skips the fields its query drops from list().
+    """
+
+    def __init__(self, lines: Iterable[Dict], skip: Iterable[str] = ()):
+        lines = list(lines)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, np.ndarray] = {}
+        self._length = len(lines)
+
+        for k, name, kind in COLUMNS:
+            values = [utils.line_value(line, k) for line in lines]
+            if kind == FLOAT:
+                self._columns[name] = _floats(values)
+            elif kind == INT:
+                self._columns[name] = _ints(values)
+            else:
+                codes, categories = _encode(_ints(values))
+                self._columns[name] = codes
+                self._categories[name] = categories
+
+        translations = registry.yaml("dictionary")
+        skipped = _SKIPPED.union(k for k, _, _ in COLUMNS).union(skip)
+        for k in lines[0] if lines else ():
+            if k in skipped:
+                continue
+            values = [d.get(k) for d in lines]
+            v = next((v for v in values if v is not None), None)
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                self._columns[translations.get(k, k)] = _floats(values)
+
+    @classmethod
+    def _from_columns(
+        cls, columns: Dict[str, np.ndarray], categories: Dict[str, np.ndarray]
+    ) -> "LineTable":
+        """Build a table holding the given arrays, without copying them."""
+        table = cls.__new__(cls)
+        table._columns = columns
+        table._categories = categories
+        table._length = len(next(iter(columns.values())))
+        return table
+
+    @classmethod
+    def of(cls, lines) -> "LineTable":
+        """Get the table of a Lines query, building it if it isn't cached yet.
+
+        The same as lines.table(): the table is cached on the query, and rebuilt only
+        if the query's response changes. If lines is already a LineTable, it is
+        returned as is.
+        """
+        if isinstance(lines, LineTable):
+            return lines
+        return lines.table()
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def columns(self) -> List[str]:
+        """Get the column names."""
+        return list(self._columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Get the number of bytes held by the arrays of the table."""
+        arrays = [*self._columns.values(), *self._categories.values()]
+        return sum(a.nbytes for a in arrays)
+
+    def is_categorical(self, name: str) -> bool:
+        """Check whether the column name is stored as codes into its distinct ids."""
+        return name in self._categories
+
+    def codes(self, name: str) -> np.ndarray:
+        """Get the codes of the categorical column name, -1 where an id is missing."""
+        if name not in self._categories:
+            raise KeyError(f"{name} is not a categorical column.")
+        return self._columns[name]
+
+    def categories(self, name: str) -> np.ndarray:
+        """Get the sorted distinct ids of the categorical column name."""
+        return self._categories[name]
+
+    def _decoded(self, name: str) -> np.ndarray:
+        """Get the values of the column name, decoding categorical columns."""
+        column = self._columns[name]
+        if name not in self._categories:
+            return column
+        categories = self._categories[name]
+        if not len(categories):
+            return np.full(len(column), MISSING, dtype=np.int64)
+        return np.where(column >= 0, categories[column], MISSING)
+
+    def __getitem__(
+        self, key: Union[str, slice, np.ndarray, List[int]]
+    ) -> Union[np.ndarray, "LineTable"]:
+        if isinstance(key, str):
+            return self._decoded(key)
+        columns = {name: column[key] for name, column in self._columns.items()}
+        if not isinstance(key, slice):
+            # Integer and mask indexing copy; make sure a single position stays 1d.
+            columns = {name: np.atleast_1d(c) for name, c in columns.items()}
+        return LineTable._from_columns(columns, self._categories)
+
+    def dataframe(self) -> pd.DataFrame:
+        """Get a dataframe of the table, with a row for each line.
+
+        Categorical columns become pandas categoricals, and integer columns with
+        missing values become nullable Int64 columns. Timestamps stay in milliseconds.
+        """
+        data = {}
+        for name, column in self._columns.items():
+            if name in self._categories:
+                data[name] = pd.Categorical.from_codes(column, self._categories[name])
+            elif column.dtype == np.int64:
+                missing = column == MISSING
+                if missing.any():
+                    data[name] = pd.arrays.IntegerArray(column, missing)
+                else:
+                    data[name] = column
+            else:
+                data[name] = column
+        return pd.DataFrame(data, index=pd.RangeIndex(self._length))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Get a list of lines, as dicts keyed by column name.
+
+        Missing values are None, and timestamps are converted to ISO strings, as in
+        Lines.list().
+        """
+        values = {}
+        for name in self._columns:
+            column = self._decoded(name)
+            if column.dtype == np.int64:
+                missing = (column == MISSING).tolist()
+                column = [None if m else v for v, m in zip(column.tolist(), missing)]
+                if name == "datetime":
+                    column = [
+                        None if t is None else utils.timestamp_to_iso_str(t)
+                        for t in column
+                    ]
+                values[name] = column
+            else:
+                values[name] = [None if v != v else v for v in column.tolist()]
+
+        names = list(values)
+        return [dict(zip(names, row)) for row in zip(*values.values())]
+
+    def __repr__(self) -> str:
+        return f"LineTable({self._length} lines, columns={self.columns})"
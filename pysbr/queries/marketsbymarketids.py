@@ -14,6 +14,8 @@ class MarketsByMarketIds(Query):
         sport_id: SBR sport id.
     """
 
+    _arrow_schema = "markets"
+
     @Query.typecheck
     def __init__(self, market_ids: Union[List[int]], sport_id: int):
         super().__init__()
@@ -17,6 +17,8 @@ class OpeningLines(Lines):
         sportsbook_id: SBR sportsbook id.
     """
 
+    cache_ttl = 60 * 60
+
     @Query.typecheck
     def __init__(
         self,
@@ -1,16 +1,222 @@
 from string import Template
+from contextlib import contextmanager
+from contextvars import ContextVar
 import copy
+import inspect
+import math
+from itertools import chain
 import typing
-from typing import Callable, Any, Dict, Optional, List, Union
-from functools import wraps
-
-from gql import Client, gql
-from gql.transport.requests import RequestsHTTPTransport
+from typing import Callable, Any, Dict, Iterator, Mapping, Optional, List, Tuple, Union
+from functools import lru_cache, wraps
+from pathlib import Path
+import time
+
+from gql import GraphQLRequest, gql
+from graphql import (
+    DocumentNode,
+    Node,
+    ValueNode,
+    VariableNode,
+    Visitor,
+    parse,
+    parse_value,
+    visit,
+)
 import pandas as pd
-from fake_useragent import UserAgent
 
 import pysbr.utils as utils
 from pysbr.config.config import Config
+import pysbr.queries.arrow as arrow
+from pysbr.config.registry import registry
+from pysbr.queries.cache import FOREVER, Cache, MemoryCache, normalize_query
+from pysbr.queries.framebuilder import FrameBuilder
+from pysbr.queries.scheduler import NORMAL, Scheduler
+from pysbr.queries.translator import Translator
+from pysbr.queries.session import (
+    AsyncSession,
+    Session,
+    default_async_session,
+    default_session,
+)
+
+
+@lru_cache(maxsize=None)
+def _template(s: str) -> Template:
+    """Get a Template for the string s, built once per distinct string."""
+    return Template(s)
+
+
+def _format_query(
+    q_name: str, q_fields: Optional[str] = None, q_args: Optional[str] = None
+) -> str:
+    """Lay out a GraphQL query string from its name, fields and arguments."""
+    return (
+        Template(
+            utils.str_format(
+                """
+            query {
+                $q_name(
+                    $q_args
+                ) $q_fields
+            }
+        """
+            )
+        ).substitute(
+            {
+                "q_name": q_name,
+                "q_args": ""
+                if q_args is None
+                else utils.str_format(q_args, indent_=2, dedent_l1=True),
+                "q_fields": ""
+                if q_fields is None
+                else utils.str_format(q_fields, indent_=1, dedent_l1=True),
+            }
+        )
+        # graphql query will not accept single quotes, but Template string by
+        # default uses single quotes
+        .replace("'", '"')
+    )
+
+
+@lru_cache(maxsize=256)
+def _query_template(
+    q_name: str, q_fields: Optional[str], q_arg_str: Optional[str]
+) -> Template:
+    """Get the template of a query string, with placeholders for argument values.
+
+    The query is laid out once per shape (name, fields and argument template), so
+    building a query string only costs substituting the argument values.
+    """
+    return Template(_format_query(q_name, q_fields, q_arg_str))
+
+
+@lru_cache(maxsize=256)
+def _parse_query_shape(
+    q_name: str, q_fields: Optional[str], q_arg_str: Optional[str]
+) -> DocumentNode:
+    """Parse the query of a shape once, leaving its argument placeholders as variables.
+
+    Each $placeholder of the argument template parses as a GraphQL variable, which
+    _parse_query() replaces with the argument value.
+
+    Raises:
+        gql.GraphQLSyntaxError: If the query string is structured improperly.
+    """
+    return parse(_format_query(q_name, q_fields, q_arg_str))
+
+
+def _replace_node(node: Node, **changes: Any) -> Node:
+    """Copy the parsed query node, with the attributes in changes replaced."""
+    return type(node)(**{k: changes.get(k, getattr(node, k)) for k in node.keys})
+
+
+class _ArgumentValues(Visitor):
+    """Replace the variables in an argument of a parsed query with their values."""
+
+    def __init__(self, values: Dict[str, ValueNode]):
+        super().__init__()
+        self.values = values
+
+    def enter_variable(self, node: VariableNode, *_: Any) -> ValueNode:
+        return self.values[node.name.value]
+
+
+def _parse_query(
+    q_name: str,
+    q_fields: Optional[str] = None,
+    q_arg_str: Optional[str] = None,
+    q_args: Optional[Dict[str, Any]] = None,
+) -> GraphQLRequest:
+    """Build the parsed query for a query shape and argument values.
+
+    The query of each shape is parsed once. The argument values are then parsed on
+    their own, and put in place of the placeholders in a copy of the root field, so
+    the result is the same as parsing the string built by Query._build_query().
+
+    Raises:
+        gql.GraphQLSyntaxError: If the query string is structured improperly.
+        KeyError: If keys in q_args do not match placeholders in q_arg_str.
+    """
+    if q_arg_str is None or q_args is None:
+        return GraphQLRequest(_parse_query_shape(q_name, q_fields, None))
+    document = _parse_query_shape(q_name, q_fields, q_arg_str)
+    # Formatted as Template.substitute() and Query._build_query() would.
+    values = _ArgumentValues(
+        {k: parse_value(str(v).replace("'", '"')) for k, v in q_args.items()}
+    )
+
+    # Only the root field holds arguments; everything below it is shared.
+    operation = document.definitions[0]
+    selections = operation.selection_set.selections
+    field = _replace_node(
+        selections[0],
+        arguments=tuple(visit(arg, values) for arg in selections[0].arguments),
+    )
+    selection_set = _replace_node(
+        operation.selection_set, selections=(field,) + tuple(selections[1:])
+    )
+    operation = _replace_node(operation, selection_set=selection_set)
+    return GraphQLRequest(
+        _replace_node(
+            document, definitions=(operation,) + tuple(document.definitions[1:])
+        )
+    )
+
+
+# Whether Query.typecheck is skipped; see Query.trusted().
+_trusted = ContextVar("trusted", default=False)
+
+
+def _compile_validator(t: Any) -> Callable[[Any], bool]:
+    """Build a function that returns whether its argument matches the type t.
+
+    Follows the rules of the validator Query.typecheck used before validators were
+    compiled, resolving the type structure once instead of on every call.
+    """
+    t_origin = typing.get_origin(t)
+    t_args = typing.get_args(t)
+
+    if t_origin is None and len(t_args) == 0:
+        return lambda a: isinstance(a, t)
+
+    elif isinstance(t_origin, type(list)):
+        if len(t_args) == 0:
+            return lambda a: isinstance(a, list) and isinstance(a, t_origin)
+
+        if t_args == (int,):
+
+            def valid_int_list(a: Any) -> bool:
+                if not isinstance(a, list):
+                    return False
+                # Fast path: set(map(type)) runs in C. Subclasses of int (e.g. bool)
+                # fall through to isinstance().
+                if set(map(type, a)) <= {int}:
+                    return True
+                return all(isinstance(x, int) for x in a)
+
+            return valid_int_list
+
+        arg_validators = [_compile_validator(arg) for arg in t_args]
+
+        def valid_list(a: Any) -> bool:
+            if not isinstance(a, list):
+                return False
+            try:
+                for x in a:
+                    for valid in arg_validators:
+                        if not valid(x):
+                            return False
+            except TypeError:
+                return False
+            return True
+
+        return valid_list
+
+    elif isinstance(t_origin, typing._SpecialForm):
+        arg_validators = [_compile_validator(arg) for arg in t_args]
+        return lambda a: any(valid(a) for valid in arg_validators)
+
+    return lambda a: True
 
 
 class Query:
@@ -18,8 +224,56 @@ class Query:
 
     This class should not be directly instantiated; use the subclasses defined for each
     query.
+
+    Attributes:
+        session (Optional[Session]): The session used to connect to the server. If
+            None, the default session shared by all queries is used. Set this on a
+            subclass to give that type of query its own connection pool.
+        async_session (Optional[AsyncSession]): The session used by the async query
+            methods. If None, the default async session of the running event loop is
+            used.
+        lazy (bool): If True, constructing a query only builds and validates the query
+            string. The query is executed on the first call to raw(), list(),
+            dataframe(), ids() or id(), or by calling execute(). Set this on Query or
+            a subclass to make all constructions lazy, or use Query.deferred() to
+            construct a single lazy query.
+        cache (Optional[Cache]): The cache responses are stored in and looked up from
+            before querying the server. If None, responses are not cached.
+        memory_cache (Optional[MemoryCache]): In-process cache of responses, checked
+            before cache. If None, responses are not cached in memory.
+        cache_ttl (float): How long, in seconds, responses to this type of query are
+            cached for. 0 disables caching; cache.FOREVER keeps responses forever.
+        native_datetimes (bool): If True, datetime fields are kept as Unix timestamps
+            in milliseconds by list(), and dataframe() converts their columns to
+            datetime64[ns, UTC] all at once. If False, each value is converted to an
+            ISO string in the system timezone.
+        scheduler (Optional[Scheduler]): The scheduler pacing requests to the server,
+            and retrying throttled requests. If None, requests are sent as soon as
+            they are made, and not retried.
+        priority (int): The priority lane of requests for this type of query; see
+            Scheduler.
     """
 
+    session: Optional[Session] = None
+    async_session: Optional[AsyncSession] = None
+    lazy = False
+    cache: Optional[Cache] = None
+    memory_cache: Optional[MemoryCache] = None
+    cache_ttl: float = 0
+    native_datetimes = False
+    scheduler: Optional[Scheduler] = None
+    priority: int = NORMAL
+
+    # Arguments to _build_and_execute_query() for a query that has been built but not
+    # executed yet.
+    _pending: Optional[Tuple] = None
+    _query_string: Optional[str] = None
+    # Fields removed from the response during translation; see Translator.
+    _dropped_keys: Tuple[str, ...] = ()
+    _drop_within: Optional[str] = None
+    # Name of the schema used by to_arrow(); see arrow.schema(). None infers it.
+    _arrow_schema: Optional[str] = None
+
     def __init__(self):
         self._config = Config()
 
@@ -29,26 +283,15 @@ class Query:
         self._id_key = None
 
         self._translated = None
+        self._translated_native = None
+        self._frozen = None
 
-        self._arguments = utils.load_yaml((utils.build_yaml_path("arguments")))
-        self._fields = utils.load_yaml((utils.build_yaml_path("fields")))
-
-        ua = UserAgent()
-        headers = {
-            "User-Agent": ua.random,
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept-Language": "en-GB,en-US;q=0.9,en;q=0.8",
-            "Connection": "keep-alive",
-            "Host": "www.sportsbookreview.com",
-            "Referer": "https://www.sportsbookreview.com/betting-odds/",
-        }
-        transport = RequestsHTTPTransport(
-            url="https://www.sportsbookreview.com/ms-odds-v2/odds-v2-service",
-            headers=headers,
-        )
-        self.client = Client(transport=transport, fetch_schema_from_transport=False)
+        self._arguments = registry.yaml("arguments")
+        self._fields = registry.yaml("fields")
+
+        if self.session is None:
+            self.session = default_session()
+        self.client = self.session.client
 
     def typecheck(f: Callable) -> Callable:
         """Decorator for type checking arguments passed to subclass __init__ methods.
@@ -56,59 +299,69 @@ class Query:
         The purpose of decorating the subclass __init__ methods is to avoid making
         invalid queries on the GraphQL endpoint.
 
+        The validator for each argument is compiled once, when the method is
+        decorated, so checking an argument only costs walking its value. Lists of ints
+        are checked without a Python-level loop. Checking is skipped for queries
+        constructed inside a Query.trusted() block.
+
         This method is only verified to work with List, Union, and primitive types.
 
         Raises:
             TypeError: If argument does not match expected type.
         """
+        validators = None
+        # Names of the arguments after self, in order, to match positional arguments.
+        names = list(inspect.signature(f).parameters)[1:]
 
-        def recurse(a: Any, t: Dict) -> bool:
-            """Method for recursively validating nested types."""
-            t_origin = typing.get_origin(t)
-            t_args = typing.get_args(t)
-
-            if t_origin is None and len(t_args) == 0:
-                if not isinstance(a, t):
-                    return False
+        def compile_validators() -> Dict[str, Tuple[Any, Callable[[Any], bool]]]:
+            """Compile a validator for each annotated argument of f, by name."""
+            hints = typing.get_type_hints(f)
+            hints.pop("return", None)
+            return {name: (t, _compile_validator(t)) for name, t in hints.items()}
 
-            elif isinstance(t_origin, type(list)):
-                if not isinstance(a, list):
-                    return False
-                if len(t_args) > 0:
-                    try:
-                        for x in a:
-                            for arg in t_args:
-                                if not recurse(x, arg):
-                                    return False
-                    except TypeError:
-                        return False
-                else:
-                    if not isinstance(a, t_origin):
-                        return False
-
-            elif isinstance(t_origin, typing._SpecialForm):
-                for arg in t_args:
-                    is_arg = recurse(a, arg)
-                    if is_arg:
-                        return True
-                return False
-
-            return True
+        try:
+            validators = compile_validators()
+        except NameError:
+            # Forward references that can't be resolved yet; compile on first call.
+            pass
 
         @wraps(f)
-        def wrapper(*args: Any) -> Any:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
             """Wrapper returned by the decorator, wrapping the function argument."""
-            types = list(typing.get_type_hints(f).values())
-            # first argument is self, ignore it
-            for a, t in zip(args[1:], types):
-                valid = recurse(a, t)
-                if not valid:
-                    raise TypeError(f"Expected {t}, got {a}")
-
-            f(*args)
+            nonlocal validators
+            if not _trusted.get():
+                if validators is None:
+                    validators = compile_validators()
+                # first argument is self, ignore it
+                for name, a in chain(zip(names, args[1:]), kwargs.items()):
+                    checked = validators.get(name)
+                    if checked is not None and not checked[1](a):
+                        raise TypeError(f"Expected {checked[0]}, got {a}")
+
+            f(*args, **kwargs)
 
         return wrapper
 
+    @staticmethod
+    @contextmanager
+    def trusted() -> Iterator[None]:
+        """Skip type checking the arguments of queries constructed in the with block.
+
+        For internal pipelines that build arguments they already know to be valid,
+        such as large lists of ids taken from another query's response:
+
+            with Query.trusted():
+                lines = CurrentLines(event_ids, market_ids, sportsbook_ids)
+
+        Invalid arguments are not caught, and result in an invalid query being sent to
+        the server. Only affects the current thread or asyncio task.
+        """
+        token = _trusted.set(True)
+        try:
+            yield
+        finally:
+            _trusted.reset(token)
+
     def _build_args(self, arg_str: str, args: Dict[str, Any]) -> Optional[str]:
         """Build the argument string that gets inserted into a query string.
 
@@ -120,7 +373,7 @@ class Query:
             ValueError: If arg_str is not a valid Template string.
         """
         if arg_str is not None and args is not None:
-            return Template(arg_str).substitute(args)
+            return _template(arg_str).substitute(args)
         else:
             return None
 
@@ -135,32 +388,28 @@ class Query:
         Returns:
             The completed query string ready to be executed.
         """
-        return (
-            Template(
-                utils.str_format(
-                    """
-                query {
-                    $q_name(
-                        $q_args
-                    ) $q_fields
-                }
-            """
-                )
-            ).substitute(
-                {
-                    "q_name": q_name,
-                    "q_args": ""
-                    if q_args is None
-                    else utils.str_format(q_args, indent_=2, dedent_l1=True),
-                    "q_fields": ""
-                    if q_fields is None
-                    else utils.str_format(q_fields, indent_=1, dedent_l1=True),
-                }
-            )
-            # graphql query will not accept single quotes, but Template string by
-            # default uses single quotes
-            .replace("'", '"')
-        )
+        return _format_query(q_name, q_fields, q_args)
+
+    def _build_query(
+        self,
+        q_name: str,
+        q_fields: Optional[str] = None,
+        q_arg_str: Optional[str] = None,
+        q_args: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Build the GraphQL query string from a query shape and argument values.
+
+        Gives the same result as self._build_query_string() applied to
+        self._build_args(), but the query layout is cached per shape.
+
+        Raises:
+            KeyError: If keys in q_args do not match placeholders in q_arg_str.
+            ValueError: If q_arg_str is not a valid Template string.
+        """
+        if q_arg_str is None or q_args is None:
+            return _format_query(q_name, q_fields)
+        template = _query_template(q_name, q_fields, q_arg_str)
+        return template.substitute(q_args).replace("'", '"')
 
     def _get_args(self, k: str) -> str:
         """Get the value of key k from the arguments dictionary.
@@ -178,14 +427,105 @@ class Query:
         """
         return self._fields[k]
 
-    def _execute_query(self, q: str) -> Dict:
+    def _execute_query(self, q: str, shape: Optional[Tuple] = None) -> Dict:
         """Execute the GraphQL query specified by the string q.
 
+        shape is the (name, fields, argument template, argument values) q was built
+        from. If the response isn't cached, the query document is built from shape
+        with _parse_query(), or parsed from q if shape is None.
+
+        Raises:
+            gql.GraphQLSyntaxError: If the query string is structured improperly.
+            gql.Exception: If the server raises an error during execution of the query.
+        """
+        raw = self._get_cached(q)
+        if raw is None:
+            document = gql(q) if shape is None else _parse_query(*shape)
+            if self.scheduler is None:
+                raw = self.session.execute(document)
+            else:
+                raw = self.scheduler.run(
+                    lambda: self.session.execute(document), self.priority
+                )
+            self._set_cached(q, raw)
+        return raw
+
+    async def _execute_query_async(self, q: str, shape: Optional[Tuple] = None) -> Dict:
+        """Execute the GraphQL query specified by the string q asynchronously.
+
+        shape is handled as in self._execute_query().
+
         Raises:
             gql.GraphQLSyntaxError: If the query string is structured improperly.
             gql.Exception: If the server raises an error during execution of the query.
+            ImportError: If aiohttp is not installed.
+        """
+        raw = self._get_cached(q)
+        if raw is None:
+            session = self.async_session
+            if session is None:
+                session = default_async_session()
+            document = gql(q) if shape is None else _parse_query(*shape)
+            if self.scheduler is None:
+                raw = await session.execute(document)
+            else:
+                raw = await self.scheduler.run_async(
+                    lambda: session.execute(document), self.priority
+                )
+            self._set_cached(q, raw)
+        return raw
+
+    def _response_ttl(self, raw: Dict) -> float:
+        """Get how long, in seconds, the response raw may be cached for.
+
+        Subclasses may override this to decide based on the response, for example to
+        keep responses about completed events forever.
+        """
+        return self.cache_ttl
+
+    def _get_cached(self, q: str) -> Optional[Dict]:
+        """Get the cached response to the query string q, if there is one.
+
+        The memory cache is checked first. A response found in the cache on disk is
+        added to the memory cache.
         """
-        return self.client.execute(gql(q))
+        if not self.cache_ttl or (self.cache is None and self.memory_cache is None):
+            return None
+        key = normalize_query(q)
+        if self.memory_cache is not None:
+            raw = self.memory_cache.get(key)
+            if raw is not None:
+                return raw
+        if self.cache is None:
+            return None
+        entry = self.cache.get_entry(key)
+        if entry is None:
+            return None
+        raw, expires = entry
+        if self.memory_cache is not None:
+            # Keep it in memory only for as long as it has left on disk.
+            if expires is None:
+                ttl = self._response_ttl(raw)
+            elif expires == math.inf:
+                ttl = FOREVER
+            else:
+                ttl = expires - time.time()
+            if ttl > 0:
+                self.memory_cache.set(key, raw, ttl)
+        return raw
+
+    def _set_cached(self, q: str, raw: Dict) -> None:
+        """Store raw in the caches as the response to the query string q."""
+        if not self.cache_ttl or (self.cache is None and self.memory_cache is None):
+            return
+        ttl = self._response_ttl(raw)
+        if not ttl:
+            return
+        key = normalize_query(q)
+        if self.memory_cache is not None:
+            self.memory_cache.set(key, raw, ttl)
+        if self.cache is not None:
+            self.cache.set(key, raw, ttl)
 
     def _build_and_execute_query(
         self,
@@ -202,10 +542,125 @@ class Query:
             KeyError: If keys in q_args do not match placeholders in q_arg_str.
             ValueError: If q_arg_str is not a valid Template string.
         """
-        q_string = self._build_query_string(
-            q_name, q_fields, self._build_args(q_arg_str, q_args)
-        )
-        return self._execute_query(q_string)
+        q_string = self._build_query(q_name, q_fields, q_arg_str, q_args)
+        self._query_string = q_string
+        shape = (q_name, q_fields, q_arg_str, q_args)
+        if self.lazy:
+            # Parse the query layout, so that syntax errors are raised on
+            # construction. The document is built when the query is sent.
+            _parse_query_shape(q_name, q_fields, None if q_args is None else q_arg_str)
+            self._pending = shape
+            return None
+
+        return self._execute_query(q_string, shape)
+
+    async def _build_and_execute_query_async(
+        self,
+        q_name: str,
+        q_fields: Optional[str] = None,
+        q_arg_str: Optional[str] = None,
+        q_args: Optional[Dict[str, Any]] = None,
+    ) -> Dict:
+        """Build query out of parameters, then execute it asynchronously.
+
+        Raises:
+            gql.GraphQLSyntaxError: If the query string is structured improperly.
+            gql.Exception: If the server raises an error during execution of the query.
+            KeyError: If keys in q_args do not match placeholders in q_arg_str.
+            ValueError: If q_arg_str is not a valid Template string.
+        """
+        q_string = self._build_query(q_name, q_fields, q_arg_str, q_args)
+        shape = (q_name, q_fields, q_arg_str, q_args)
+        return await self._execute_query_async(q_string, shape)
+
+    def _receive(self, raw: Dict) -> None:
+        """Store the response to the pending query.
+
+        Queries that need more than one request to the server override this method, and
+        build the next request from the response (see EventsByParticipants).
+        """
+        self._raw = raw
+
+    def _build_pending_query_string(self) -> str:
+        """Build the query string of the pending query."""
+        q_name, q_fields, q_arg_str, q_args = self._pending
+        return self._build_query(q_name, q_fields, q_arg_str, q_args)
+
+    def _execute_pending(self) -> None:
+        """Execute pending queries until there are none left."""
+        while self._pending is not None:
+            q_string = self._build_pending_query_string()
+            raw = self._execute_query(q_string, self._pending)
+            # Cleared only once the request succeeded, so a failed query can be
+            # executed again. _receive() may set the next pending query.
+            self._pending = None
+            self._receive(raw)
+
+    async def _execute_pending_async(self) -> None:
+        """Execute pending queries asynchronously until there are none left."""
+        while self._pending is not None:
+            raw = await self._build_and_execute_query_async(*self._pending)
+            self._pending = None
+            self._receive(raw)
+
+    @classmethod
+    async def create(cls, *args: Any, **kwargs: Any) -> "Query":
+        """Construct the query, and execute it asynchronously.
+
+        This is the asyncio counterpart of calling the class directly, and takes the
+        same arguments. For example:
+
+            lines = await CurrentLines.create(event_ids, market_ids, sportsbook_ids)
+
+        Use utils.gather() to execute many queries concurrently.
+
+        Raises:
+            TypeError: If an argument does not match the expected type.
+            gql.Exception: If the server raises an error during execution of the query.
+            ImportError: If aiohttp is not installed.
+        """
+        self = cls.deferred(*args, **kwargs)
+        await self._execute_pending_async()
+        return self
+
+    @classmethod
+    def deferred(cls, *args: Any, **kwargs: Any) -> "Query":
+        """Construct the query without executing it.
+
+        Takes the same arguments as calling the class directly. The query string is
+        built and validated, and the query is executed on the first call to raw(),
+        list(), dataframe(), ids() or id(), or by calling execute(). See Query.lazy.
+
+        Raises:
+            TypeError: If an argument does not match the expected type.
+            gql.GraphQLSyntaxError: If the query string is structured improperly.
+        """
+        self = cls.__new__(cls)
+        self.lazy = True
+        self.__init__(*args, **kwargs)
+        return self
+
+    def execute(self) -> "Query":
+        """Execute the query, if it has not been executed yet, and return it.
+
+        Raises:
+            gql.Exception: If the server raises an error during execution of the query.
+        """
+        self._execute_pending()
+        return self
+
+    def is_executed(self) -> bool:
+        """Return True if the query has been executed."""
+        return self._pending is None
+
+    def query_string(self) -> Optional[str]:
+        """Get the query string of the most recently built query.
+
+        For a lazy query that has not been executed, this is the query that will be
+        sent to the server next. Useful for deduplicating queries before executing
+        them.
+        """
+        return self._query_string
 
     def _find_data(self):
         """Return a reference to to the relevant part of the query response.
@@ -220,74 +675,69 @@ class Query:
 
         return data
 
-    def _translate_dict(self, d: Dict) -> Dict:
+    def _translator(self) -> Translator:
+        """Get the translator for this type of query, shared by all its instances."""
+        drop, drop_within = self._dropped_keys, self._drop_within
+        native = self.native_datetimes
+        return registry.get(
+            ("translator", drop, drop_within, native),
+            lambda: Translator(registry.yaml("dictionary"), drop, drop_within, native),
+        )
+
+    def _frame_builder(self) -> FrameBuilder:
+        """Get the dataframe builder shared by all queries."""
+        return registry.get(
+            ("frame builder",), lambda: FrameBuilder(registry.yaml("dtypes"))
+        )
+
+    def _translate_dict(self, d: Union[Dict, List]) -> Union[Dict, List]:
         """Use translations from Config class to translate GraphQL response.
 
         This method is used by self.list() and self.dataframe() in order to translate
         field names from SBR into English words. Timestamps are converted into ISO
-        strings.
-        """
-
-        def _recurse(el):
-            """Recursive method used to iterate over all dict keys."""
-            if isinstance(el, dict):
-                # MUST cast to list to avoid RuntimeError because d.pop()
-                for k in list(el.keys()):
-                    try:
-                        old_k = k
-                        # raises KeyError if no translation available
-                        k = t[k]
-
-                        v = el.pop(old_k)
-                        try:
-                            # Sometimes values that should be integers are returned as
-                            # strings. Need to make sure we're not truncating floats,
-                            # however.
-                            if isinstance(v, str):
-                                v = int(v)
-                        except ValueError:
-                            pass
-                        if k in ["datetime", "start datetime", "end datetime"]:
-                            try:
-                                # SearchEvents returns Zulu time iso string for value of
-                                # 'date'.
-                                v = utils.iso_str_to_timestamp(
-                                    utils.iso_zulu_to_offset(v)
-                                )
-                            except (AttributeError, ValueError):
-                                # AttributeError raised by iso_zulu_to_offset if v is a
-                                # timestamp. ValueError raised by iso_str_to_timestamp
-                                # if v is invalid isoformat string.
-                                pass
-                            try:
-                                el[k] = utils.timestamp_to_iso_str(v)
-                            except TypeError:
-                                el[k] = v
-                        else:
-                            el[k] = v
-                    except KeyError:
-                        pass
-                    v = el[k]
-                    if isinstance(v, dict) or isinstance(v, list):
-                        _recurse(v)
-            elif isinstance(el, list):
-                for x in el:
-                    _recurse(x)
-
-        t = self._config.translations()
-        _recurse(d)
-        return d
-
-    def _copy_and_translate_data(self) -> List[Dict]:
-        """Translate SBR fields in GraphQL response, and return a copy.
-
-        This method is used by self.list() and self.dataframe(). self._translated
-        caches the translated data.
-        """
-        if self._translated is None:
-            data = copy.deepcopy(self._find_data())
-            self._translated = self._translate_dict(data)
-        return copy.deepcopy(self._translated)
+        strings. Keys in self._dropped_keys are removed.
+
+        Returns a translated copy; d is not modified.
+        """
+        return self._translator().translate(d)
+
+    def _build_translated(self) -> Union[List[Dict], Dict]:
+        """Translate the relevant part of the GraphQL response into a new object.
+
+        Called at most once per response, by self._translated_data(). Subclasses that
+        need extra processing steps override this method.
+        """
+        return self._translate_dict(self._find_data())
+
+    def _translated_data(self) -> Union[List[Dict], Dict]:
+        """Get the translated data, translating it the first time it is needed.
+
+        self._translated caches the translated data. The data returned is shared by all
+        accessors, so it must be copied before it is modified. It is translated again
+        if self.native_datetimes has changed since.
+        """
+        if self._translated is None or self._translated_native != self.native_datetimes:
+            self._translated = self._build_translated()
+            self._translated_native = self.native_datetimes
+        return self._translated
+
+    def _translated_list(self) -> List[Dict]:
+        """Get the shared translated data as a list of elements."""
+        data = self._translated_data()
+        # Some queries return dictionaries. Enforce this method returning a list.
+        if isinstance(data, dict):
+            data = [data]
+        return data
+
+    def _frozen_list(self) -> Tuple[Mapping, ...]:
+        """Get a read-only view of the translated elements.
+
+        The view is built once per translation, and shared by all callers.
+        """
+        data = self._translated_list()
+        if self._frozen is None or self._frozen[0] is not data:
+            self._frozen = (data, utils.freeze(data))
+        return self._frozen[1]
 
     def arguments(self) -> Dict[str, str]:
         """Get the arguments dictionary, containing templates for all subqueries."""
@@ -299,6 +749,7 @@ class Query:
 
     def raw(self) -> Dict:
         """Get the raw GraphQL response, without any data processing."""
+        self._execute_pending()
         return self._raw
 
     def id(self) -> Optional[int]:
@@ -336,24 +787,30 @@ class Query:
                 f"{type(self).__name__} does not have a default return id type."
             )
 
-        translated = self.list()
+        self._execute_pending()
         ids = []
-        for el in translated:
+        for el in self._translated_list():
             ids.append(el[self._id_key])
 
         return list(set(ids))
 
-    def list(self) -> List[Dict[str, Union[str, List, Dict]]]:
+    def list(
+        self, readonly: bool = False
+    ) -> Union[List[Dict[str, Union[str, List, Dict]]], Tuple[Mapping, ...]]:
         """Get a list of translated elements returned from the query.
 
         Each element in the response is a dict with fields requested in the query and
         the element's values for those fields. The fields are translated.
+
+        The response is translated once, and each call returns a deep copy of the
+        translation that the caller is free to modify. If readonly is True, a read-only
+        view (see utils.freeze()) is returned instead, which is built once and shared
+        between calls. Use it to avoid copying large responses.
         """
-        data = self._copy_and_translate_data()
-        # Some queries return dictionaries. Enforce this method returning a list.
-        if isinstance(data, dict):
-            data = [data]
-        return data
+        self._execute_pending()
+        if readonly:
+            return self._frozen_list()
+        return copy.deepcopy(self._translated_list())
 
     def dataframe(self) -> pd.DataFrame:
         """Get a dataframe of elements returned from the query.
@@ -364,27 +821,74 @@ class Query:
         which is a list of keys expected to be in each element that have values that
         are lists.
 
+        Columns are given the types listed for their fields in dtypes.yaml, e.g.
+        nullable Int64 for ids and category for names; see FrameBuilder. If
+        self.native_datetimes is True, datetime columns are datetime64[ns, UTC].
+
         If the elements cannot be flattened, a dataframe of the nested elements is
         returned.
         """
-        data = self._copy_and_translate_data()
-
-        # Using sublist_keys instead of recursive method because there is a possibility
-        # of overwriting keys without realizing it if using recursive method.
-        # The idea is that pd.json_normalize() doesn't work on sublists.
-        if self._sublist_keys is not None:
-            for k in self._sublist_keys:
-                for el in data:
-                    try:
-                        for i, subel in enumerate(el.get(k)):
-                            new_key = f"{k}.{i+1}"
-                            el[new_key] = subel
-                        el.pop(k)
-                    except TypeError:
-                        pass
-                    except AttributeError:
-                        pass
-        try:
-            return pd.json_normalize(data)
-        except AttributeError:
-            return pd.DataFrame(data)
+        self._execute_pending()
+        return self._frame_builder().build(
+            self._translated_list(), self._sublist_keys, self.native_datetimes
+        )
+
+    def _translate_element(self, el: Dict) -> Dict:
+        """Translate one element of the response, for self.iter_rows().
+
+        Subclasses whose _build_translated() adds steps to the translation override
+        this method to apply them to a single element.
+        """
+        return self._translate_dict(el)
+
+    def iter_rows(self) -> Iterator[Dict]:
+        """Iterate over the translated elements returned from the query, one at a time.
+
+        Unlike self.list(), elements are translated from the raw response as they are
+        yielded, and neither the translation nor a copy of it is kept by the query. A
+        consumer handling each element in turn, e.g. writing it to a file, only holds
+        the raw response and the current element in memory. Each element is a new
+        dict the caller may modify.
+        """
+        self._execute_pending()
+        data = self._find_data()
+        # Some queries return dictionaries; see self._translated_list().
+        if isinstance(data, dict):
+            data = [data]
+        return (self._translate_element(el) for el in data)
+
+    def _arrow_data(self) -> List:
+        """Get the elements exported by self.to_arrow() and self.to_parquet()."""
+        self._execute_pending()
+        return self._translated_list()
+
+    def to_arrow(self):
+        """Get an Apache Arrow table of elements returned from the query.
+
+        The table is built straight from the translated response, without going
+        through a dataframe. Events, lines, consensus history and markets have a fixed
+        schema; see pysbr.queries.arrow. Requires pyarrow (pip install
+        python-sbr[arrow]).
+
+        Returns:
+            pyarrow.Table: A table with a row for each element.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        return arrow.build_table(self._arrow_data(), self._arrow_schema)
+
+    def to_parquet(self, path: Union[str, Path], **kwargs) -> None:
+        """Write the elements returned from the query to a Parquet file.
+
+        The file has the schema of self.to_arrow(), and is written in batches, so the
+        whole table is never held in memory. Requires pyarrow.
+
+        Args:
+            path: Path of the file to write.
+            kwargs: Passed on to pyarrow.parquet.ParquetWriter, e.g. compression.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        arrow.write_parquet(self._arrow_data(), path, self._arrow_schema, **kwargs)
@@ -0,0 +1,290 @@
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from gql.transport.exceptions import TransportServerError
+
+T = TypeVar("T")
+
+# Priority lanes. Requests in a lower lane are sent before any waiting request in a
+# higher one.
+HIGH = 0
+NORMAL = 5
+LOW = 10
+
+
+def is_retryable(e: BaseException) -> bool:
+    """Check whether the request failed because the server is throttling or failing.
+
+    That is an HTTP 429 (Too Many Requests) or 5xx response.
+    """
+    if not isinstance(e, TransportServerError):
+        return False
+    code = getattr(e, "code", None)
+    return code is not None and (code == 429 or 500 <= code < 600)
+
+
+class Scheduler:
+    """Pace the requests sent to the server, and retry those that are throttled.
+
+    Requests are sent at most rate per second on average, with bursts of up to burst
+    requests, from a token bucket, and at most max_concurrent at a time. Requests
+    waiting to be sent are sent in order of priority (HIGH, NORMAL or LOW), then in
+    the order they arrived, so e.g. polls of CurrentLines go before a backlog of
+    LineHistory requests.
+
+    When the server answers with HTTP 429 or 5xx, the request is retried after an
+    exponential backoff with full jitter, up to max_retries times. A 429 also halves
+    the rate (down to min_rate) and holds back every request until the backoff is
+    over; each successful request then adds a tenth of the configured rate back.
+
+    Queries use the scheduler assigned to Query.scheduler, or to a subclass, e.g.
+
+        Query.scheduler = Scheduler(rate=2, max_concurrent=4)
+
+    Safe to share between threads, and between threads and asyncio tasks.
+
+    Args:
+        rate: The max average number of requests per second.
+        burst: The max number of requests sent at once after a quiet period. If None,
+            the rate rounded up.
+        max_concurrent: The max number of requests in flight at once.
+        max_retries: The max number of times a throttled request is retried.
+        backoff: The base delay, in seconds, before the first retry.
+        max_backoff: The max delay, in seconds, before any retry.
+        min_rate: The rate is never lowered below this after a 429.
+
+    Raises:
+        ValueError: If rate, burst or max_concurrent is not positive.
+    """
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: Optional[int] = None,
+        max_concurrent: int = 4,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        min_rate: float = 0.1,
+    ):
+        if burst is None:
+            burst = max(1, math.ceil(rate))
+        if rate <= 0 or burst < 1 or max_concurrent < 1:
+            raise ValueError("rate, burst and max_concurrent must be positive.")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.min_rate = min(min_rate, rate)
+
+        self._cond = threading.Condition()
+        self._rate = rate
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        # Heap of (priority, arrival) tickets of the requests waiting to be sent.
+        self._waiting: List[Tuple[int, int]] = []
+        self._arrivals = itertools.count()
+        # Event loop and event of each ticket waiting in acquire_async(), set when the
+        # request may be sendable.
+        self._async_waiters: Dict[
+            Tuple[int, int], Tuple[asyncio.AbstractEventLoop, asyncio.Event]
+        ] = {}
+
+    @property
+    def current_rate(self) -> float:
+        """Get the rate requests are sent at, lowered after the server throttled."""
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last refill."""
+        earned = (now - self._refilled) * self._rate
+        self._tokens = min(self.burst, self._tokens + earned)
+        self._refilled = now
+
+    def _try_acquire(self, ticket: Tuple[int, int]) -> Optional[float]:
+        """Take a token and a slot for the request holding ticket, if it may be sent.
+
+        Must be called with self._cond held. Returns 0 if the request may be sent,
+        the number of seconds until it may be if only time holds it back, or None if
+        it has to wait for another request to be sent or to finish.
+        """
+        if self._waiting[0] != ticket or self._active >= self.max_concurrent:
+            return None
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens < 1:
+            return (1 - self._tokens) / self._rate
+
+        self._tokens -= 1
+        self._active += 1
+        heapq.heappop(self._waiting)
+        self._async_waiters.pop(ticket, None)
+        # The next request in line may be sendable now.
+        self._notify()
+        return 0
+
+    def _notify(self) -> None:
+        """Wake the request first in line, which may be sendable now.
+
+        Must be called with self._cond held. Threads waiting in acquire() are woken
+        through the condition, and a task waiting in acquire_async() through its event,
+        from any thread.
+        """
+        self._cond.notify_all()
+        if not self._waiting:
+            return
+        waiter = self._async_waiters.get(self._waiting[0])
+        if waiter is not None:
+            loop, event = waiter
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+    def _withdraw(self, ticket: Tuple[int, int]) -> None:
+        """Remove ticket from the line, e.g. when its waiting request is cancelled."""
+        with self._cond:
+            self._async_waiters.pop(ticket, None)
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._notify()
+
+    def acquire(self, priority: int = NORMAL) -> None:
+        """Wait until a request of the given priority may be sent.
+
+        Call release() once the request is done; run() does both.
+        """
+        ticket = (priority, next(self._arrivals))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    wait = self._try_acquire(ticket)
+                    if wait == 0:
+                        return
+                    self._cond.wait(wait)
+            except BaseException:
+                self._withdraw(ticket)
+                raise
+
+    async def acquire_async(self, priority: int = NORMAL) -> None:
+        """Wait until a request of the given priority may be sent, asynchronously.
+
+        The task sleeps until another request is sent or finishes, or until the time
+        holding it back is over, without polling.
+        """
+        ticket = (priority, next(self._arrivals))
+        event = asyncio.Event()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._async_waiters[ticket] = (asyncio.get_running_loop(), event)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(ticket)
+                    # Cleared under the lock, so a wake-up sent from now on is kept.
+                    event.clear()
+                if wait == 0:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._withdraw(ticket)
+            raise
+
+    def release(self) -> None:
+        """Free the slot of a request that succeeded."""
+        self._finish(succeeded=True)
+
+    def _finish(self, succeeded: bool, throttled_for: Optional[float] = None) -> None:
+        """Free the slot of a request that is done, and adjust the rate.
+
+        If the server throttled the request, throttled_for is the delay before it is
+        retried, during which no request is sent.
+        """
+        with self._cond:
+            self._active -= 1
+            if throttled_for is not None:
+                self._rate = max(self.min_rate, self._rate / 2)
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + throttled_for
+                )
+            elif succeeded:
+                self._rate = min(self.rate, self._rate + self.rate / 10)
+            self._notify()
+
+    def _delay(self, attempt: int) -> float:
+        """Get the delay before retry number attempt, counting from 0."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _failed(self, e: BaseException, attempt: int) -> Optional[float]:
+        """Release the slot of a failed request, and get the delay before its retry.
+
+        None is returned if the request should not be retried.
+        """
+        if not is_retryable(e) or attempt >= self.max_retries:
+            self._finish(succeeded=False)
+            return None
+        delay = self._delay(attempt)
+        self._finish(False, delay if e.code == 429 else None)
+        return delay
+
+    def run(self, fn: Callable[[], T], priority: int = NORMAL) -> T:
+        """Send a request by calling fn, once it may be sent, retrying if throttled.
+
+        Raises:
+            Exception: Any exception raised by fn, once it is not retried any more.
+        """
+        for attempt in itertools.count():
+            self.acquire(priority)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._finish(succeeded=False)
+                raise
+            self.release()
+            return result
+
+    async def run_async(
+        self, fn: Callable[[], Awaitable[T]], priority: int = NORMAL
+    ) -> T:
+        """Send a request by awaiting fn(), once it may be sent, retrying if throttled.
+
+        Raises:
+            Exception: Any exception raised by fn, once it is not retried any more.
+        """
+        for attempt in itertools.count():
+            await self.acquire_async(priority)
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._finish(succeeded=False)
+                raise
+            self.release()
+            return result
@@ -1,5 +1,4 @@
 import json
-import copy
 
 from pysbr.queries.query import Query
 
@@ -29,6 +28,9 @@ class SearchEvents(Query):
 
     """
 
+    cache_ttl = 60
+    _arrow_schema = "events"
+
     @Query.typecheck
     def __init__(self, search_term: str):
         super().__init__()
@@ -50,7 +52,13 @@ class SearchEvents(Query):
             except TypeError:
                 pass
 
-    def _copy_and_translate_data(self):
-        data = copy.deepcopy(self._find_data())
+    def _build_translated(self):
+        # _string_to_json() only replaces a top-level value of each element.
+        data = [dict(el) for el in self._find_data()]
         self._string_to_json(data, "eventParticipants")
         return self._translate_dict(data)
+
+    def _translate_element(self, el):
+        el = dict(el)
+        self._string_to_json([el], "eventParticipants")
+        return self._translate_dict(el)
@@ -0,0 +1,236 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+import weakref
+
+from gql import Client
+from gql.transport.requests import RequestsHTTPTransport
+import requests
+from requests.adapters import HTTPAdapter
+from fake_useragent import UserAgent
+
+URL = "https://www.sportsbookreview.com/ms-odds-v2/odds-v2-service"
+
+
+def build_headers(user_agent: str) -> Dict[str, str]:
+    """Build the HTTP headers sent with every query."""
+    return {
+        "User-Agent": user_agent,
+        "Content-Type": "application/json",
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Language": "en-GB,en-US;q=0.9,en;q=0.8",
+        "Connection": "keep-alive",
+        "Host": "www.sportsbookreview.com",
+        "Referer": "https://www.sportsbookreview.com/betting-odds/",
+    }
+
+
+class _PooledTransport(RequestsHTTPTransport):
+    """Requests transport that keeps its connections open between queries.
+
+    gql connects and closes the transport around every call to Client.execute(). The
+    default transport creates and throws away a requests.Session each time, which
+    means a new TCP / TLS handshake for every query. This transport uses the
+    requests.Session owned by a pysbr Session instead, and leaves it open on close.
+    """
+
+    def __init__(self, http_session: requests.Session, **kwargs):
+        super().__init__(**kwargs)
+        self._http_session = http_session
+
+    def connect(self):
+        self.session = self._http_session
+
+    def close(self):
+        pass
+
+
+class Session:
+    """Pool of HTTP connections to the SBR GraphQL endpoint.
+
+    A session is shared by every Query instance that uses it, so that connections to
+    the server are kept alive and reused across queries. The User-Agent header is
+    chosen once per session.
+
+    By default all queries share one session, created the first time a query is made
+    (see default_session()). To use a different session for all queries, pass it to
+    set_default_session(). To use it for one type of query, set the session class
+    attribute on the query class, e.g. LineHistory.session = Session(pool_size=20).
+
+    Sessions are safe to share between threads.
+
+    Args:
+        pool_size: The max number of connections to keep open to the server.
+        user_agent: Value for the User-Agent header. If None, a random user agent is
+            chosen.
+    """
+
+    def __init__(self, pool_size: int = 10, user_agent: Optional[str] = None):
+        self.pool_size = pool_size
+        self.user_agent = user_agent if user_agent is not None else UserAgent().random
+        self.headers = build_headers(self.user_agent)
+
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        for prefix in "http://", "https://":
+            self._http.mount(prefix, adapter)
+
+        transport = _PooledTransport(self._http, url=URL, headers=self.headers)
+        self.client = Client(transport=transport, fetch_schema_from_transport=False)
+
+    def execute(self, document: Any) -> Dict:
+        """Execute the query document returned by gql.gql(), and return the response.
+
+        Raises:
+            gql.Exception: If the server raises an error during execution of the query.
+        """
+        return self.client.execute(document)
+
+    def close(self) -> None:
+        """Close all open connections held by the session."""
+        self._http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncSession:
+    """Pool of HTTP connections to the SBR GraphQL endpoint, for use with asyncio.
+
+    This is the asyncio counterpart of Session, built on gql's aiohttp transport. It
+    is used by Query.create() and the other async query methods. aiohttp must be
+    installed to use it (pip install python-sbr[async]).
+
+    The connection is opened the first time a query is executed, and is bound to the
+    event loop running at that time. Close the session with close() before the event
+    loop ends, or use it as an async context manager.
+
+    Args:
+        pool_size: The max number of connections to keep open to the server.
+        user_agent: Value for the User-Agent header. If None, a random user agent is
+            chosen.
+    """
+
+    def __init__(self, pool_size: int = 10, user_agent: Optional[str] = None):
+        self.pool_size = pool_size
+        self.user_agent = user_agent if user_agent is not None else UserAgent().random
+        self.headers = build_headers(self.user_agent)
+
+        self.client = None
+        self._client_session = None
+        # Created on first use, so that it belongs to the event loop running then.
+        self._lock = None
+
+    async def _connect(self):
+        """Open the connection pool, if it isn't open already.
+
+        Raises:
+            ImportError: If aiohttp is not installed.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._client_session is not None:
+                return self._client_session
+
+            import aiohttp
+            from gql.transport.aiohttp import AIOHTTPTransport
+
+            transport = AIOHTTPTransport(
+                url=URL,
+                headers=self.headers,
+                client_session_args={
+                    "connector": aiohttp.TCPConnector(limit=self.pool_size)
+                },
+            )
+            self.client = Client(transport=transport, fetch_schema_from_transport=False)
+            self._client_session = await self.client.connect_async()
+            return self._client_session
+
+    async def execute(self, document: Any) -> Dict:
+        """Execute the query document returned by gql.gql(), and return the response.
+
+        Raises:
+            gql.Exception: If the server raises an error during execution of the query.
+            ImportError: If aiohttp is not installed.
+        """
+        session = self._client_session
+        if session is None:
+            session = await self._connect()
+        return await session.execute(document)
+
+    async def close(self) -> None:
+        """Close all open connections held by the session."""
+        if self._lock is None:
+            return
+        async with self._lock:
+            if self._client_session is not None:
+                await self.client.close_async()
+                self._client_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def default_session() -> Session:
+    """Get the session shared by all queries that don't have their own session.
+
+    It is created the first time this function is called.
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = Session()
+        return _default_session
+
+
+def set_default_session(session: Optional[Session]) -> None:
+    """Replace the session shared by all queries that don't have their own session.
+
+    If session is None, a new default session is created the next time it is needed.
+    """
+    global _default_session
+    with _default_session_lock:
+        _default_session = session
+
+
+_default_async_sessions = weakref.WeakKeyDictionary()
+
+
+def default_async_session() -> AsyncSession:
+    """Get the async session shared by all queries that don't have their own session.
+
+    There is one default async session per event loop, created the first time this
+    function is called while the loop is running. Await close_default_async_session()
+    before the loop ends to close its connections, e.g.
+
+        async def main():
+            try:
+                lines = await CurrentLines.create(event_ids, market_ids, sportsbook_ids)
+            finally:
+                await close_default_async_session()
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return _default_async_sessions[loop]
+    except KeyError:
+        session = _default_async_sessions[loop] = AsyncSession()
+        return session
+
+
+async def close_default_async_session() -> None:
+    """Close the default async session of the running event loop, if there is one."""
+    session = _default_async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -20,6 +20,8 @@ class Sportsbooks(Query):
         system_sportsbook_ids:  The system ids of the sportsbooks of interest.
     """
 
+    cache_ttl = 6 * 60 * 60
+
     @Query.typecheck
     def __init__(self, system_sportsbook_ids: Union[List[int], int]):
         super().__init__()
@@ -0,0 +1,169 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+import pysbr.utils as utils
+
+# Translated keys whose values are timestamps or ISO strings, converted to ISO strings,
+# or to timestamps if the translator keeps native datetimes.
+DATETIME_KEYS = frozenset(["datetime", "start datetime", "end datetime"])
+
+# Value converters used in plans.
+NO_CONVERSION = 0
+TO_INT = 1
+TO_ISO_STR = 2
+TO_TIMESTAMP = 3
+
+# (old key, new key, value converter) for each key of a dict.
+Plan = List[Tuple[str, str, int]]
+
+
+# First characters of strings that int() might accept, other than non-ASCII ones.
+_INT_START = frozenset("0123456789+- \t\n\r\f\v")
+
+
+def _may_be_int(s: str) -> bool:
+    """Cheap check rejecting most strings, which don't hold integers."""
+    c = s[:1]
+    return c in _INT_START or not c.isascii()
+
+
+def to_int(v: Any) -> Any:
+    """Convert v to an int if it is a string holding an integer.
+
+    Sometimes values that should be integers are returned as strings. Floats are not
+    truncated, and other values are returned unchanged.
+    """
+    if not isinstance(v, str):
+        return v
+    if not _may_be_int(v):
+        return v
+    s = v.strip()
+    digits = s[1:] if s and s[0] in "+-" else s
+    if digits.isdecimal():
+        return int(s)
+    if "_" in s:
+        # Underscores between digits, e.g. '1_000', are rare, so let int() decide.
+        try:
+            return int(s)
+        except ValueError:
+            pass
+    return v
+
+
+def to_iso_str(v: Any) -> Any:
+    """Convert v to an ISO string if it is a timestamp or an ISO string.
+
+    SearchEvents returns Zulu time ISO strings; other queries return Unix timestamps in
+    milliseconds, sometimes as strings. Values that are neither are returned unchanged.
+    """
+    v = to_int(v)
+    if isinstance(v, str):
+        try:
+            v = utils.iso_str_to_timestamp(utils.iso_zulu_to_offset(v))
+        except ValueError:
+            return v
+    elif not isinstance(v, (int, float)):
+        return v
+    return utils.timestamp_to_iso_str(v)
+
+
+def to_timestamp(v: Any) -> Any:
+    """Convert v to a Unix timestamp in milliseconds if it is one or an ISO string.
+
+    This is the counterpart of to_iso_str() for translators keeping native datetimes.
+    Values that are neither are returned unchanged.
+    """
+    v = to_int(v)
+    if isinstance(v, str):
+        try:
+            return int(utils.iso_str_to_timestamp(utils.iso_zulu_to_offset(v)))
+        except ValueError:
+            return v
+    return v
+
+
+class Translator:
+    """Translate the field names of GraphQL responses into English words.
+
+    Instead of checking every key of every dict against the translations, the
+    translator compiles a plan for each distinct dict shape (tuple of keys) it sees:
+    the new name of each key, and the converter applied to its value. Responses hold
+    many dicts of the same few shapes, so after the first element of a response each
+    dict is translated by looking up its plan and applying it in one pass.
+
+    The translated response is built from new dicts and lists, leaving the input
+    untouched. Keys that are translated are moved after the keys that are not, as
+    earlier versions of Query._translate_dict() did.
+
+    Translators are cached by the config registry; see Query._translator().
+
+    Args:
+        translations: Map SBR field names to English words.
+        drop: Field names removed from the response, before translation.
+        drop_within: If not None, dicts holding this field name keep their fields
+            listed in drop; they are only removed from dicts without it, such as the
+            nested dict itself.
+        native_datetimes: If True, the values of DATETIME_KEYS fields are converted
+            to Unix timestamps in milliseconds instead of ISO strings.
+    """
+
+    def __init__(
+        self,
+        translations: Mapping[str, str],
+        drop: Iterable[str] = (),
+        drop_within: Optional[str] = None,
+        native_datetimes: bool = False,
+    ):
+        self._translations = translations
+        self._drop: FrozenSet[str] = frozenset(drop)
+        self._drop_within = drop_within
+        self._to_datetime = TO_TIMESTAMP if native_datetimes else TO_ISO_STR
+        self._plans: Dict[Tuple[str, ...], Plan] = {}
+
+    def _compile(self, keys: Tuple[str, ...]) -> Plan:
+        """Build the plan for dicts with the given keys."""
+        t = self._translations
+        drop = self._drop if self._drop_within not in keys else frozenset()
+        kept = [(k, k, NO_CONVERSION) for k in keys if k not in t and k not in drop]
+        translated = []
+        for k in keys:
+            if k in t and k not in drop:
+                new_k = t[k]
+                convert = self._to_datetime if new_k in DATETIME_KEYS else TO_INT
+                translated.append((k, new_k, convert))
+        return kept + translated
+
+    def translate(self, data: Any) -> Any:
+        """Return a translated copy of data."""
+        if isinstance(data, dict):
+            return self._translate_dict(data)
+        elif isinstance(data, list):
+            return self._translate_list(data)
+        return data
+
+    def _translate_list(self, data: List) -> List:
+        """Return a translated copy of the list data."""
+        return [self.translate(x) for x in data]
+
+    def _translate_dict(self, d: Dict) -> Dict:
+        """Return a translated copy of the dict d, following the plan for its shape."""
+        keys = tuple(d)
+        plan = self._plans.get(keys)
+        if plan is None:
+            # Plans are only ever added, and building one twice is harmless, so no
+            # lock is needed to share a translator between threads.
+            plan = self._plans[keys] = self._compile(keys)
+
+        out = {}
+        for old_k, new_k, convert in plan:
+            v = d[old_k]
+            if convert:
+                if convert == TO_ISO_STR:
+                    v = to_iso_str(v)
+                elif convert == TO_TIMESTAMP:
+                    v = to_timestamp(v)
+                elif v.__class__ is str and _may_be_int(v):
+                    v = to_int(v)
+            if isinstance(v, (dict, list)):
+                v = self.translate(v)
+            out[new_k] = v
+        return out
@@ -1,10 +1,12 @@
+import asyncio
 import json
 from inspect import cleandoc
 from textwrap import indent
 from datetime import datetime
 from pathlib import Path
 import pathlib
-from typing import Dict, Any, List
+from types import MappingProxyType
+from typing import Awaitable, Dict, Any, List
 
 from pytz import timezone, utc
 import yaml
@@ -142,3 +144,64 @@ def iso_zulu_to_offset(iso_str: str) -> str:
     ISO string in Zulu time.
     """
     return iso_str.replace("Z", "+00:00")
+
+
+def freeze(item: Any) -> Any:
+    """Return a read-only view of item.
+
+    Dicts are wrapped in MappingProxyType and lists are converted to tuples, at every
+    level of nesting. Other values are returned unchanged.
+    """
+    if isinstance(item, (dict, MappingProxyType)):
+        return MappingProxyType({k: freeze(v) for k, v in item.items()})
+    elif isinstance(item, (list, tuple)):
+        return tuple(freeze(x) for x in item)
+    else:
+        return item
+
+
+def thaw(item: Any) -> Any:
+    """Return a mutable copy of item, undoing freeze().
+
+    Read-only views are converted back to dicts, and tuples to lists, at every level
+    of nesting. Other values are returned unchanged.
+    """
+    if isinstance(item, (dict, MappingProxyType)):
+        return {k: thaw(v) for k, v in item.items()}
+    elif isinstance(item, (list, tuple)):
+        return [thaw(x) for x in item]
+    else:
+        return item
+
+
+def line_value(line: Dict, k: str) -> Any:
+    """Get field k of the raw line, looking in its nested 'line' dict if needed.
+
+    ConsensusHistory nests the line within each element, and the nested dict may be
+    None for the oldest elements.
+    """
+    v = line.get(k)
+    if v is None:
+        nested = line.get("line")
+        if isinstance(nested, dict):
+            v = nested.get(k)
+    return v
+
+
+async def gather(*aws: Awaitable, limit: int = 10) -> List:
+    """Run awaitables concurrently, with at most limit of them running at once.
+
+    Works like asyncio.gather(), returning the results in the same order as aws. Useful
+    for fanning out many async queries without flooding the server, e.g.:
+
+        lines = await gather(
+            *[LineHistory.create(e, m, s, p) for e, m, s, p in combos], limit=5
+        )
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*[run(aw) for aw in aws])
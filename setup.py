@@ -28,4 +28,5 @@ setup(
     """,
     include_package_data=True,
     install_requires=["gql", "pandas", "pytz", "pyyaml", "fake-useragent"],
+    extras_require={"async": ["aiohttp"], "arrow": ["pyarrow"]},
 )
@@ -222,6 +222,40 @@ class TestEventsByParticipants(EventsByParticipants):
         return self.patch_fn(self, *args)
 
 
+class TestAsyncEventsByDate(EventsByDate):
+    def __init__(self, league_ids, dt, patch_fn, cassette_name):
+        self.cassette_name = cassette_name
+        self.patch_fn = patch_fn
+        super().__init__(league_ids, dt)
+
+    async def _build_and_execute_query_async(self, *args):
+        return self.patch_fn(self)
+
+
+class TestAsyncEventsByParticipants(EventsByParticipants):
+    def __init__(
+        self,
+        participant_ids,
+        start,
+        end,
+        league_id,
+        sport_id,
+        patch_fn,
+        cassette_name,
+        cassette_name2,
+    ):
+        self.cassette_name = cassette_name
+        self.cassette_name2 = cassette_name2
+        self.calls = 0
+        self.patch_fn = patch_fn
+        super().__init__(
+            participant_ids, start, end, league_id=league_id, sport_id=sport_id
+        )
+
+    async def _build_and_execute_query_async(self, *args):
+        return self.patch_fn(self, *args)
+
+
 class TestEventsByDateRange(EventsByDateRange):
     def __init__(self, league_ids, start, end, patch_fn, cassette_name):
         self.cassette_name = cassette_name
@@ -728,6 +762,35 @@ def events_by_participants(execute_factory):
     return fn
 
 
+@fixture
+def async_events_by_date(execute_factory):
+    async def fn(league_ids, dt, cassette_name):
+        return await TestAsyncEventsByDate.create(
+            league_ids, dt, execute_factory, cassette_name
+        )
+
+    return fn
+
+
+@fixture
+def async_events_by_participants(execute_factory):
+    async def fn(
+        participant_ids, start, end, league_id, sport_id, cassette_name, cassette_name2
+    ):
+        return await TestAsyncEventsByParticipants.create(
+            participant_ids,
+            start,
+            end,
+            league_id=league_id,
+            sport_id=sport_id,
+            patch_fn=execute_factory,
+            cassette_name=cassette_name,
+            cassette_name2=cassette_name2,
+        )
+
+    return fn
+
+
 @fixture
 def events_by_date_range(execute_factory):
     def fn(league_ids, start, end, cassette_name):
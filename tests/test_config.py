@@ -2,6 +2,11 @@ import pytest
 from pytest import mark
 from pytest_lazyfixture import lazy_fixture
 
+from pysbr.config.registry import registry
+from pysbr.config.snapshot import build_snapshot, load_snapshot
+from pysbr.config.sport import NCAAF
+from pysbr.config.sportsbook import Sportsbook
+
 
 class TestConfig:
     @mark.parametrize(
@@ -89,3 +94,35 @@ class TestConfig:
                 sportsbook.ids(terms)
         else:
             assert sportsbook.ids(terms) == expected
+
+    def test_registry_shared(self, nfl):
+        ncaaf = NCAAF()
+        assert nfl._sport is ncaaf._sport
+        assert nfl._translations is registry.yaml("dictionary")
+        with pytest.raises(TypeError):
+            nfl._sport["sport id"] = 42
+
+        # Callers get mutable copies, of the same types as the config files.
+        config = nfl.sport_config()
+        assert isinstance(config, dict)
+        assert isinstance(config["markets"], list)
+        config["sport id"] = 42
+        assert nfl.sport_config()["sport id"] == ncaaf.sport_id
+        assert isinstance(nfl.league_config(), dict)
+        assert isinstance(nfl.translations(), dict)
+        assert isinstance(nfl.search_translations(), dict)
+        assert isinstance(Sportsbook().sportsbook_config(), dict)
+
+    def test_snapshot(self, tmp_path):
+        path = build_snapshot(tmp_path.joinpath("snapshot.pickle"))
+        entries = load_snapshot(path)
+        assert entries[("yaml", "fields")]["event"] == registry.yaml("fields")["event"]
+        assert ("team ids", "nfl") in entries
+        assert ("sportsbook ids",) in entries
+        assert load_snapshot(tmp_path.joinpath("missing.pickle")) == {}
+
+
+def test_registry_instance():
+    assert registry.instance(NCAAF) is registry.instance(NCAAF)
+    assert registry.instance(NCAAF) is not NCAAF()
+    assert registry.instance(Sportsbook).names == Sportsbook().names
@@ -1,13 +1,54 @@
+import asyncio
+import threading
+import time
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import List, Optional, Union
 
 from pytest import mark
 import pytest
 from pytest_lazyfixture import lazy_fixture
 from gql import gql
+from gql.transport.exceptions import TransportServerError
+from graphql import print_ast
 import pandas as pd
 
 import pysbr.utils as utils
+from pysbr.queries.query import Query, _parse_query, _parse_query_shape
+import pysbr.queries.query as query_module
+from pysbr.queries.eventsbydate import EventsByDate
+from pysbr.queries.eventsbydaterange import EventsByDateRange
+from pysbr.queries.eventindex import EventIndex
+from pysbr.queries.eventsbyeventids import EventsByEventIds
+from pysbr.queries.eventsbyparticipants import EventsByParticipants
+from pysbr.queries.eventstore import EventStore
+from pysbr.queries.eventsync import EventSync
+from pysbr.queries.framebuilder import FrameBuilder
+import pysbr.queries.arrow as arrow
+from pysbr.queries.linehistory import LineHistory
+from pysbr.queries.lines import Lines
+from pysbr.queries.linetable import MISSING, LineTable
+from pysbr.queries.linepoller import LinePoller
+from pysbr.queries.currentlines import CurrentLines
+from pysbr.queries.batch import (
+    execute_batch,
+    execute_concurrently,
+    _build_batch_string,
+)
+from pysbr.queries.session import (
+    AsyncSession,
+    Session,
+    close_default_async_session,
+)
+from pysbr.queries.scheduler import HIGH, LOW, Scheduler
+from pysbr.queries.translator import Translator
+from pysbr.queries.cache import (
+    FOREVER,
+    SQLiteCache,
+    DirectoryCache,
+    MemoryCache,
+    normalize_query,
+)
 
 
 class TestQuery:
@@ -135,6 +176,46 @@ class TestQuery:
         )
         assert result["eventsByDateNew"]["events"][0]["eid"] == 4143517
 
+    @mark.parametrize(
+        ("arg_key", "field_key", "args", "other_args"),
+        [
+            (
+                "date",
+                "event",
+                {"lids": [16], "timestamp": 1603944000000},
+                {"lids": [16, 6], "timestamp": 1604030400000},
+            ),
+            (
+                "search_event",
+                "search_event",
+                {"search_term": ["chiefs"]},
+                {"search_term": ["kansas city"]},
+            ),
+            (
+                "date_range",
+                None,
+                {"lids": [16], "start": 1603944000000, "end": 1604030400000},
+                {"lids": [16], "start": 1604030400000, "end": 1604116800000},
+            ),
+            ("event_ids", None, {"eids": [4143517, 4143518]}, {"eids": [4143519]}),
+        ],
+    )
+    def test_build_query_cached(self, query, arg_key, field_key, args, other_args):
+        q_arg_str = query._get_args(arg_key)
+        q_fields = None if field_key is None else query._get_fields(field_key)
+        _parse_query_shape.cache_clear()
+        for a in [args, other_args]:
+            q_string = query._build_query("eventsV2", q_fields, q_arg_str, a)
+            assert q_string == query._build_query_string(
+                "eventsV2", q_fields, query._build_args(q_arg_str, a)
+            )
+            document = _parse_query("eventsV2", q_fields, q_arg_str, a)
+            assert print_ast(document.document) == print_ast(gql(q_string).document)
+
+        # The query is parsed once for both sets of argument values.
+        info = _parse_query_shape.cache_info()
+        assert (info.misses, info.hits) == (1, 1)
+
     @mark.parametrize(
         ("fn", "k", "expected"),
         [("args", "date", True), ("fields", "event", True), ("fields", "foo", False)],
@@ -1062,6 +1143,8 @@ class TestQuery:
         c = current_lines(e.ids(), market_ids, [5, 9, 20], cassette_lines)
         l_ = c.list(e)
         df = c.dataframe(e)
+        bets = c._resolve_bets(l_)
+        assert bets == [c._resolve_bet(line) for line in l_]
         # assert lines_obj is not None
         assert l_ is not None
         assert df is not None
@@ -1092,6 +1175,953 @@ class TestQuery:
         c = current_lines(e.ids(), market_ids, [5, 9, 20], cassette_lines)
         l_ = c.list(e)
         df = c.dataframe(e)
+        bets = c._resolve_bets(l_)
+        assert bets == [c._resolve_bet(line) for line in l_]
         # assert lines_obj is not None
         assert l_ is not None
         assert df is not None
+
+    def test_session(self, query):
+        assert query.client is Query().client
+
+        session = Session(pool_size=2, user_agent="pysbr")
+        assert session.headers["User-Agent"] == "pysbr"
+        transport = session.client.transport
+        transport.connect()
+        transport.close()
+        transport.connect()
+        assert transport.session is session._http
+
+    def test_async_queries(
+        self, events_by_date, async_events_by_date, async_events_by_participants
+    ):
+        dt = datetime.strptime("2020-10-29", "%Y-%m-%d")
+        s_ = datetime.strptime("2020-09-09", "%Y-%m-%d")
+        e_ = datetime.strptime("2020-11-16", "%Y-%m-%d")
+
+        async def run():
+            return await utils.gather(
+                async_events_by_date(16, dt, "test_events_by_date1"),
+                async_events_by_participants(
+                    [1530],
+                    s_,
+                    e_,
+                    16,
+                    None,
+                    "test_events_by_participant_subquery_nfl1",
+                    "test_events_by_participant_nfl1",
+                ),
+                limit=1,
+            )
+
+        e1, e2 = asyncio.run(run())
+        assert e1.ids() == events_by_date(16, dt, "test_events_by_date1").ids()
+        assert 4143362 in e2.ids()
+
+    def test_deferred(self, events_by_date, monkeypatch):
+        dt = datetime.strptime("2020-10-29", "%Y-%m-%d")
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+        calls = []
+
+        def execute(q, shape=None):
+            calls.append(q)
+            return response
+
+        e = EventsByDate.deferred(16, dt)
+        e._execute_query = execute
+        assert not e.is_executed()
+        assert "eventsByDateNew" in e.query_string()
+        assert calls == []
+
+        assert e.ids() == events_by_date(16, dt, "test_events_by_date1").ids()
+        assert e.is_executed()
+        e.list()
+        e.execute()
+        assert calls == [e.query_string()]
+
+        # A query whose request failed stays pending, and is sent again.
+        expected = events_by_date(16, dt, "test_events_by_date1").ids()
+
+        class FlakySession:
+            client = None
+            calls = 0
+
+            def execute(self, document):
+                self.calls += 1
+                if self.calls == 1:
+                    raise TransportServerError("unavailable", 503)
+                return response
+
+        session = FlakySession()
+        monkeypatch.setattr(EventsByDate, "session", session)
+        monkeypatch.setattr(EventsByDate, "scheduler", None)
+        e = EventsByDate.deferred(16, dt)
+        with pytest.raises(TransportServerError):
+            e.execute()
+        assert not e.is_executed()
+        assert e.ids() == expected
+        assert session.calls == 2
+
+        class FlakyAsyncSession:
+            async def execute(self, document):
+                return session.execute(document)
+
+        session.calls = 0
+        monkeypatch.setattr(EventsByDate, "async_session", FlakyAsyncSession())
+        e = EventsByDate.deferred(16, dt)
+        with pytest.raises(TransportServerError):
+            asyncio.run(e._execute_pending_async())
+        assert not e.is_executed()
+        asyncio.run(e._execute_pending_async())
+        assert e.is_executed() and session.calls == 2
+
+        # Keyword arguments are type checked like positional ones.
+        e = EventsByDate.deferred(league_ids=[16], dt=dt)
+        assert e.args["lids"] == [16]
+        with pytest.raises(TypeError):
+            EventsByDate.deferred(16, dt="2020-10-29")
+
+    def test_history_ttl(self, line_history, tmp_path, monkeypatch):
+        h = line_history(4143532, 401, 20, [1530, 1520], "test_line_history_nfl1")
+        raw = h.raw()
+        last_line = max(line["tim"] for line in h._find_data())
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+        event = dict(
+            response["eventsByDateNew"]["events"][0],
+            eid=4143532,
+            es="scheduled",
+            dt=last_line + 10**9,
+        )
+
+        class HistorySession:
+            client = None
+            calls = 0
+
+            def execute(self, document):
+                self.calls += 1
+                if "lineHistory" in print_ast(document.document):
+                    return raw
+                return {"eventsV2": {"events": [event]}}
+
+        # Deciding how long to cache the history never sends a request.
+        session = HistorySession()
+        monkeypatch.setattr(Query, "session", session)
+        assert h._response_ttl(raw) == h.cache_ttl
+
+        # The lines haven't moved in years, but the event hasn't started.
+        store = EventStore(tmp_path / "events.sqlite")
+        monkeypatch.setattr(Lines, "event_store", store)
+        store.add_events([event])
+        assert h._response_ttl(raw) == h.cache_ttl
+        store.add_events([dict(event, es="complete")])
+        assert h._response_ttl(raw) == FOREVER
+        store.add_events([dict(event, es="postponed", dt=last_line - 1000)])
+        assert h._response_ttl(raw) == FOREVER
+
+        # Recent lines are never cached forever.
+        monkeypatch.setattr(h, "settled_age", 10**12)
+        assert h._response_ttl(raw) == h.cache_ttl
+        assert session.calls == 0
+        store.close()
+
+        # Without a store, the history is stored forever once the events passed in
+        # show it is over, also for lazily built queries.
+        monkeypatch.setattr(Lines, "event_store", None)
+        monkeypatch.setattr(Query, "lazy", True)
+        memory_cache = MemoryCache()
+        monkeypatch.setattr(Query, "memory_cache", memory_cache)
+        q = LineHistory(4143532, 401, 20, [1530, 1520])
+        q.execute()
+        key = normalize_query(q.query_string())
+        assert memory_cache._entries[key][1] < FOREVER
+        assert session.calls == 1
+
+        event["es"] = "complete"
+        events = EventsByEventIds([4143532])
+        q.list(events)
+        assert session.calls == 2
+        assert memory_cache._entries[key][1] == FOREVER
+
+    def test_async_session_lock(self):
+        session = AsyncSession()
+        # The lock is created in the loop that first uses the session.
+        assert session._lock is None
+        asyncio.run(session.close())
+        asyncio.run(close_default_async_session())
+
+    def test_execute_batch(self, events_by_date):
+        dt = datetime.strptime("2020-10-29", "%Y-%m-%d")
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+
+        class BatchSession:
+            calls = 0
+
+            def execute(self, document):
+                self.calls += 1
+                return {
+                    "q0": response["eventsByDateNew"],
+                    "q1": response["eventsByDateNew"],
+                }
+
+        session = BatchSession()
+        queries = [EventsByDate.deferred(16, dt), EventsByDate.deferred(16, dt)]
+        execute_batch(queries, session)
+        assert session.calls == 1
+
+        expected = events_by_date(16, dt, "test_events_by_date1").ids()
+        for q in queries:
+            assert q.is_executed()
+            assert q.ids() == expected
+
+        gql(_build_batch_string([EventsByDate.deferred(16, dt)] * 2))
+
+    @mark.parametrize("cache_cls", [SQLiteCache, DirectoryCache])
+    def test_cache(self, cache_cls, tmp_path, monkeypatch):
+        dt = datetime.strptime("2020-10-29", "%Y-%m-%d")
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+
+        class CountingSession:
+            client = None
+            calls = 0
+
+            def execute(self, document):
+                self.calls += 1
+                return response
+
+        session = CountingSession()
+        cache = cache_cls(tmp_path.joinpath("cache"))
+        monkeypatch.setattr(EventsByDate, "session", session)
+        monkeypatch.setattr(EventsByDate, "cache", cache)
+        monkeypatch.setattr(EventsByDate, "cache_ttl", 60)
+
+        ids = EventsByDate(16, dt).ids()
+        assert EventsByDate(16, dt).ids() == ids
+        assert session.calls == 1
+
+        key = normalize_query(EventsByDate.deferred(16, dt).query_string())
+        cache.set(key, response, -1)
+        EventsByDate(16, dt)
+        assert session.calls == 2
+
+        cache.set(key, response, FOREVER)
+        assert cache_cls(tmp_path.joinpath("cache")).get(key) == response
+        assert cache.get_entry(key) == (response, FOREVER)
+
+        cache.clear()
+        EventsByDate(16, dt)
+        assert session.calls == 3
+
+        monkeypatch.setattr(EventsByDate, "cache_ttl", 0)
+        cache.clear()
+        EventsByDate(16, dt)
+        EventsByDate(16, dt)
+        assert session.calls == 5
+
+    def test_memory_cache(self, tmp_path, monkeypatch):
+        dt = datetime.strptime("2020-10-29", "%Y-%m-%d")
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+
+        class CountingSession:
+            client = None
+            calls = 0
+
+            def execute(self, document):
+                self.calls += 1
+                return response
+
+        session = CountingSession()
+        memory_cache = MemoryCache(max_entries=2)
+        disk_cache = DirectoryCache(tmp_path)
+        monkeypatch.setattr(EventsByDate, "session", session)
+        monkeypatch.setattr(EventsByDate, "memory_cache", memory_cache)
+
+        e = EventsByDate(16, dt)
+        assert EventsByDate(16, dt).raw() == e.raw()
+        assert session.calls == 1
+        assert memory_cache.hits == 1
+        assert memory_cache.misses == 1
+
+        # Neither cache hits nor building lazy queries build a query document.
+        def parse(*args):
+            raise AssertionError("The query document should not be built.")
+
+        with monkeypatch.context() as m:
+            m.setattr(query_module, "_parse_query", parse)
+            EventsByDate(16, dt)
+            EventsByDate.deferred(16, dt).execute()
+
+        # Changing a response doesn't change the cached copy.
+        e.raw()["eventsByDateNew"].clear()
+        assert EventsByDate(16, dt).ids() != []
+
+        # A response found on disk is added to the memory cache.
+        memory_cache.clear()
+        monkeypatch.setattr(EventsByDate, "cache", disk_cache)
+        disk_cache.set(normalize_query(e.query_string()), response, FOREVER)
+        EventsByDate(16, dt)
+        EventsByDate(16, dt)
+        assert session.calls == 1
+        assert memory_cache.stats()["entries"] == 1
+        assert memory_cache._entries[normalize_query(e.query_string())][1] == FOREVER
+
+        # It is kept in memory only for as long as it has left on disk.
+        memory_cache.clear()
+        disk_cache.set(normalize_query(e.query_string()), response, 30)
+        EventsByDate(16, dt)
+        expires = memory_cache._entries[normalize_query(e.query_string())][1]
+        assert time.time() < expires <= time.time() + 30
+
+        for i in range(3):
+            memory_cache.set(str(i), {"i": i}, 60)
+        assert memory_cache.evictions == 2
+        assert memory_cache.get("0") is None
+        assert memory_cache.get("2") == {"i": 2}
+
+        small = MemoryCache(max_bytes=40)
+        small.set("a", {"a": 1}, 60)
+        small.set("b", {"b": 1}, 60)
+        assert small.get("a") is None
+        assert small.stats()["bytes"] == 25
+        small.set("c", {"c": "x" * 40}, 60)
+        assert small.get("c") is None
+
+    def test_translation_shared(self, events_by_date, current_lines):
+        dt = datetime.strptime("2020-11-22", "%Y-%m-%d")
+        e = events_by_date(16, dt, "test_lines_with_events_with_scores_events_nfl1")
+        c = current_lines(
+            e.ids(),
+            [83, 401, 402],
+            [5, 9, 20],
+            "test_lines_with_events_with_scores_lines_nfl1",
+        )
+
+        l_ = c.list(e)
+        assert any("result" in line for line in l_)
+        assert list(c.iter_lines(e)) == l_
+        l_[0]["event"] = "foo"
+        assert c.list(e)[0]["event"] != "foo"
+        assert c.list(e) == [dict(line) for line in c.list(e, readonly=True)]
+        assert "event" not in c.list()[0]
+
+        frozen = c.list(e, readonly=True)
+        assert c.list(e, readonly=True) is frozen
+        with pytest.raises(TypeError):
+            frozen[0]["event"] = "foo"
+
+        e.dataframe()
+        assert "participants" in e.list()[0]
+        assert isinstance(e.list(readonly=True)[0]["participants"], tuple)
+
+    def test_translator(self):
+        t = {"eid": "event id", "dt": "datetime", "nam": "name", "sbid": "sbid"}
+        translator = Translator(t, drop=["sbid"], drop_within="line")
+        data = [
+            {"eid": "42", "x": "1.5", "dt": 0, "sbid": 1, "line": {"sbid": 2, "y": 3}},
+            {"nam": "a", "y": [{"eid": " -7 "}, "12"], "line": None, "sbid": 1},
+            {"dt": "2020-11-22T18:00:00Z", "sbid": 1},
+            {"dt": "not a date"},
+        ]
+        translated = translator.translate(data)
+        assert translated[0] == {
+            "x": "1.5",
+            "line": {"y": 3},
+            "event id": 42,
+            "datetime": utils.timestamp_to_iso_str(0),
+            "sbid": 1,
+        }
+        assert list(translated[0]) == ["x", "line", "event id", "datetime", "sbid"]
+        assert translated[1] == {
+            "y": [{"event id": -7}, "12"],
+            "line": None,
+            "name": "a",
+            "sbid": 1,
+        }
+        assert translated[2] == {"datetime": utils.timestamp_to_iso_str(1606068000000)}
+        assert translated[3] == {"datetime": "not a date"}
+        assert data[0]["eid"] == "42"
+        assert data[0]["line"] == {"sbid": 2, "y": 3}
+
+    def test_typecheck_trusted(self, current_lines):
+        with pytest.raises(TypeError):
+            current_lines([1, True, "2"], 401, 20, "dummy_cassette")
+        with pytest.raises(TypeError):
+            current_lines(list(range(5000)) + [1.5], 401, 20, "dummy_cassette")
+
+        @Query.typecheck
+        def f(self, a: List[Union[int, str]], b: Optional[List[int]] = None):
+            pass
+
+        f(None, [1, "a"], [True, 2])
+        f(None, [], None)
+        with pytest.raises(TypeError):
+            f(None, [1.5])
+        with pytest.raises(TypeError):
+            f(None, 1)
+
+        with Query.trusted():
+            f(None, 1)
+        with pytest.raises(TypeError):
+            f(None, 1)
+
+    def test_event_index(self, events_by_date, current_lines):
+        dt = datetime.strptime("2020-11-22", "%Y-%m-%d")
+        e = events_by_date(16, dt, "test_lines_with_events_with_scores_events_nfl1")
+        index = EventIndex.of(e)
+        assert EventIndex.of(e) is index
+        assert EventIndex.of(index) is index
+        assert set(index.descriptions) == set(e.ids())
+        assert index.league_ids == {16}
+
+        def lines():
+            return current_lines(
+                e.ids(),
+                [83, 401, 402],
+                [5, 9, 20],
+                "test_lines_with_events_with_scores_lines_nfl1",
+            )
+
+        c1, c2 = lines(), lines()
+        assert c1.list(index) == c2.list(e)
+        assert c2.list(e)[0]["participant full name"] is not None
+        assert any(line["participant"] in ["over", "under"] for line in c1.list(e))
+        assert EventIndex.of(e) is index
+
+    def test_line_table(self, current_lines, consensus_history, line_history):
+        c = current_lines(
+            [4143394],
+            [83, 401, 402],
+            [5, 9, 20],
+            "test_lines_with_events_with_scores_lines_nfl1",
+        )
+        table = c.table()
+        assert c.table() is table
+        assert LineTable.of(table) is table
+        assert len(table) == len(c.list())
+        assert table.nbytes < 100 * len(table)
+        assert table.is_categorical("sportsbook id")
+        assert set(table.categories("sportsbook id")) <= {5, 9, 20}
+        for row, line in zip(table.list(), c.list()):
+            assert row == {k: line.get(k) for k in row}
+
+        df = table.dataframe()
+        assert len(df) == len(table)
+        assert df["market id"].dtype == "category"
+        assert list(df["event id"]) == list(table["event id"])
+
+        odds = table["decimal odds"]
+        best = table[odds == odds.max()]
+        assert len(best) == (odds == odds.max()).sum()
+        assert (best["decimal odds"] == odds.max()).all()
+        assert len(table[:3]) == 3 and len(table[0]) == 1
+
+        # Ids and timestamps with a fraction are missing rather than truncated.
+        lines = [{"eid": 1, "tim": 2.0}, {"eid": 1.5, "tim": "3"}, {"tim": None}]
+        table = LineTable(lines)
+        assert table["event id"].tolist() == [1, MISSING, MISSING]
+        assert table["datetime"].tolist() == [2, 3, MISSING]
+
+        h = line_history(4143532, 401, 20, [1530, 1520], "test_line_history_nfl1")
+        assert len(h.table()) == len(h.list())
+
+        ch = consensus_history(4143394, [401, 83, 402], "test_consensus_history_nfl1")
+        table = ch.table()
+        assert {"wagers", "percentage", "volume", "total volume"} <= set(table.columns)
+        assert "system sportsbook id" not in table.columns
+        for row, line in zip(table.list(), ch.list()):
+            assert row["event id"] == line["event id"]
+            assert row["datetime"] == line["datetime"]
+            assert row["wagers"] == line["wagers"]
+            nested = line.get("line") or {}
+            assert row["decimal odds"] == nested.get("decimal odds")
+
+    def test_frame_builder(self, events_by_date):
+        builder = FrameBuilder({"event id": "Int64", "name": "category"})
+        data = [
+            {"event id": 1, "source": {"name": "a", "x": {"y": 1}}, "p": [{"id": 1}]},
+            {"p": [{"id": 2}, 3], "event id": None, "source": {"name": "b"}},
+        ]
+        df = builder.build(data, ["p"])
+        assert list(df.columns) == [
+            "event id",
+            "source.name",
+            "source.x.y",
+            "p.1.id",
+            "p.2",
+        ]
+        assert str(df["event id"].dtype) == "Int64"
+        assert df["event id"].isna().tolist() == [False, True]
+        assert df["source.name"].dtype == "category"
+        assert df["p.2"].tolist()[1] == 3
+        assert builder.build([1, 2]).shape == (2, 1)
+
+        dt = datetime.strptime("2020-11-22", "%Y-%m-%d")
+        e = events_by_date(16, dt, "test_lines_with_events_with_scores_events_nfl1")
+        df = e.dataframe()
+        assert str(df["event id"].dtype) == "Int64"
+        assert str(df["participants.1.participant id"].dtype) == "Int64"
+        assert df["event status"].dtype == "category"
+        assert sorted(df["event id"]) == sorted(e.ids())
+
+    def test_native_datetimes(self, events_by_date, current_lines):
+        dt = datetime.strptime("2020-11-22", "%Y-%m-%d")
+        e = events_by_date(16, dt, "test_lines_with_events_with_scores_events_nfl1")
+        c = current_lines(
+            e.ids(),
+            [83, 401, 402],
+            [5, 9, 20],
+            "test_lines_with_events_with_scores_lines_nfl1",
+        )
+        iso = e.dataframe()["datetime"]
+        lines = c.list(e)
+
+        e.native_datetimes = c.native_datetimes = True
+        assert isinstance(e.list()[0]["datetime"], int)
+        df = e.dataframe()
+        assert str(df["datetime"].dtype) == "datetime64[ns, UTC]"
+        assert (df["datetime"] == pd.to_datetime(iso, utc=True)).all()
+
+        native = c.list(e)
+        assert [line["result"] for line in native] == [
+            line["result"] for line in lines
+        ]
+        assert str(c.dataframe(e)["datetime"].dtype) == "datetime64[ns, UTC]"
+
+        e.native_datetimes = False
+        assert e.list()[0]["datetime"] == iso[0]
+
+    def test_arrow(self, events_by_date, current_lines, consensus_history, tmp_path):
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+
+        dt = datetime.strptime("2020-11-22", "%Y-%m-%d")
+        e = events_by_date(16, dt, "test_lines_with_events_with_scores_events_nfl1")
+        c = current_lines(
+            e.ids(),
+            [83, 401, 402],
+            [5, 9, 20],
+            "test_lines_with_events_with_scores_lines_nfl1",
+        )
+
+        table = e.to_arrow()
+        assert table.schema == arrow.schema("events")
+        assert table.column("event id").to_pylist() == [
+            el["event id"] for el in e.list()
+        ]
+        participants = table.column("participants").to_pylist()[0]
+        assert participants[0]["participant id"] == (
+            e.list()[0]["participants"][0]["participant id"]
+        )
+        e.native_datetimes = True
+        assert e.to_arrow().equals(table)
+
+        table = c.to_arrow(e)
+        assert table.schema == arrow.schema("lines")
+        assert table.column("result").to_pylist() == [
+            line.get("result") for line in c.list(e)
+        ]
+        assert c.to_arrow().column("result").null_count == len(table)
+
+        path = tmp_path.joinpath("lines.parquet")
+        c.to_parquet(path, e)
+        assert pq.read_table(path).equals(table)
+
+        ch = consensus_history(4143394, [401, 83, 402], "test_consensus_history_nfl1")
+        table = ch.to_arrow()
+        assert table.schema == arrow.schema("consensus")
+        lines = table.column("line").to_pylist()
+        i = next(i for i, el in enumerate(ch.list()) if el["line"] is not None)
+        assert lines[i]["decimal odds"] == ch.list()[i]["line"]["decimal odds"]
+        assert lines[i]["datetime"] == pd.Timestamp(ch.list()[i]["line"]["datetime"])
+        assert all(
+            (line is None) == (el["line"] is None)
+            for line, el in zip(lines, ch.list())
+        )
+
+        assert arrow.build_table([{"datetime": 0}]).schema.field(
+            "datetime"
+        ).type == pa.timestamp("ms", tz="UTC")
+
+    def test_iter_rows(self, search_events, current_lines, line_history):
+        e = search_events("nebraska", "test_lines_with_search_events_events_ncaab1")
+        rows = e.iter_rows()
+        assert next(rows) == e.list()[0]
+        assert list(e.iter_rows()) == e.list()
+
+        c = current_lines(
+            e.ids(), [401], [5, 9, 20], "test_lines_with_search_events_lines_ncaab1"
+        )
+        assert list(c.iter_lines()) == c.list()
+        assert list(c.iter_lines(e)) == c.list(e)
+        line = next(c.iter_lines(e))
+        line["event"] = "foo"
+        assert c.list(e)[0]["event"] != "foo"
+
+        h = line_history(4143532, 401, 20, [1530, 1520], "test_line_history_nfl1")
+        assert list(h.iter_rows()) == h.list()
+
+    def test_events_by_date_range_chunked(self, events_by_date, monkeypatch):
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+
+        class ChunkSession:
+            client = None
+
+            def __init__(self):
+                self.calls = []
+
+            def execute(self, document):
+                self.calls.append(document)
+                return {"eventsV2": response["eventsByDateNew"]}
+
+        session = ChunkSession()
+        monkeypatch.setattr(EventsByDateRange, "session", session)
+        start = datetime(2020, 10, 1)
+        end = datetime(2020, 10, 22)
+        expected = events_by_date(
+            16, datetime(2020, 10, 29), "test_events_by_date1"
+        ).ids()
+
+        e = EventsByDateRange.chunked([16, 6], start, end, timedelta(days=7))
+        assert len(session.calls) == 3
+        assert e.is_executed()
+        assert sorted(e.ids()) == sorted(set(expected))
+
+        events = EventsByDateRange.iter_chunked(
+            [16, 6], start, end, timedelta(days=10), max_workers=2, per_league=True
+        )
+        assert [event["event id"] for event in events] == e.ids()
+        assert len(session.calls) == 3 + 6
+
+        EventsByDateRange.chunked(16, start, start, timedelta(days=7))
+        assert len(session.calls) == 10
+        with pytest.raises(ValueError):
+            EventsByDateRange.chunked(16, start, end, timedelta(0))
+        with pytest.raises(ValueError):
+            EventsByDateRange.chunked(16, start, end, max_workers=0)
+
+        class Slow:
+            def __init__(self, i):
+                self.i = i
+
+            def execute(self):
+                if self.i == 5:
+                    raise RuntimeError(self.i)
+                time.sleep(0.01 * (self.i % 3))
+                return self
+
+        done = execute_concurrently([Slow(i) for i in range(5)], max_workers=3)
+        assert [q.i for q in done] == list(range(5))
+        with pytest.raises(RuntimeError):
+            list(execute_concurrently([Slow(i) for i in range(10)], max_workers=2))
+
+    def test_event_store(self, events_by_date_range, tmp_path, monkeypatch):
+        store = EventStore(tmp_path / "events.sqlite")
+        e = events_by_date_range(
+            16,
+            datetime(2020, 10, 29),
+            datetime(2020, 11, 8),
+            "test_events_by_date_range_nfl2",
+        )
+        raw = e._find_data()
+        assert store.add(e) == len(raw)
+        assert store.covers(16, datetime(2020, 10, 30), datetime(2020, 11, 7))
+        assert not store.covers(16, datetime(2020, 10, 1), datetime(2020, 11, 7))
+        assert not store.covers(6, datetime(2020, 10, 30), datetime(2020, 11, 7))
+
+        partid = raw[0]["participants"][0]["partid"]
+        expected = [
+            ev["eid"]
+            for ev in raw
+            if any(p["partid"] == partid for p in ev["participants"])
+        ]
+        ids = store.event_ids(partid, league_id=16)
+        assert sorted(ids) == sorted(expected)
+        assert [ev["eid"] for ev in store.events(ids)] == ids
+        assert store.event_ids(partid, league_id=6) == []
+
+        opponent = next(
+            p["partid"]
+            for p in raw[0]["participants"]
+            if p["partid"] != partid
+        )
+        matchups = store.event_ids(
+            [partid, opponent], all_participants=True, latest_first=True
+        )
+        assert raw[0]["eid"] in matchups
+        assert len(store.event_ids([partid, opponent], limit=1)) == 1
+
+        class StoreSession:
+            client = None
+
+            def __init__(self):
+                self.calls = []
+
+            def execute(self, document):
+                self.calls.append(document)
+                return {"eventsV2": {"events": store.events(expected)}}
+
+        session = StoreSession()
+        monkeypatch.setattr(EventsByParticipants, "session", session)
+        monkeypatch.setattr(EventsByParticipants, "event_store", store)
+        p = EventsByParticipants(
+            partid, datetime(2020, 10, 30), datetime(2020, 11, 7), 16
+        )
+        # Only the request for the matching events is made.
+        assert len(session.calls) == 1
+        assert p.args == {"eids": ids}
+        assert sorted(p.ids()) == sorted(expected)
+        assert store.add(p) == len(expected)
+
+        # No event matches, so no request is made and nothing is added.
+        p = EventsByParticipants(-1, datetime(2020, 10, 30), datetime(2020, 11, 7), 16)
+        assert len(session.calls) == 1
+        assert store.add(p) == 0
+
+        store.clear()
+        assert not store.covers(16, datetime(2020, 10, 30), datetime(2020, 11, 7))
+        assert store.event_ids(partid) == []
+        store.close()
+
+    def test_event_sync(self, tmp_path, monkeypatch):
+        response = utils.load_yaml(
+            utils.build_yaml_path("test_events_by_date1", "tests/graphql_responses")
+        )
+        template = response["eventsByDateNew"]["events"][0]
+        now = datetime(2020, 11, 20, 12).astimezone()
+
+        def event(eid, days, status, scores=True):
+            dt = utils.datetime_to_timestamp(now + timedelta(days=days))
+            return dict(
+                template,
+                eid=eid,
+                lid=16,
+                dt=dt,
+                es=status,
+                scores=[{"partid": 1, "val": 3}] if scores else [],
+            )
+
+        events = [
+            event(1, -10, "complete"),
+            event(2, -9, "canceled", False),
+            event(3, -1, "complete"),
+            event(4, 1, "scheduled"),
+            event(5, 2, "complete", False),
+        ]
+
+        class SyncSession:
+            client = None
+
+            def __init__(self):
+                self.calls = 0
+
+            def execute(self, document):
+                self.calls += 1
+                return {"eventsV2": {"events": events}}
+
+        session = SyncSession()
+        monkeypatch.setattr(EventsByDateRange, "session", session)
+        store = EventStore(tmp_path / "events.sqlite")
+        start = now - timedelta(days=28)
+        sync = EventSync(store, 16, start, lookahead=timedelta(days=7))
+
+        assert sync.run(now) == {16: 5}
+        # 35 days in chunks of 7 days.
+        assert session.calls == 5
+        assert sorted(store.event_ids(league_id=16)) == [1, 2, 3, 4, 5]
+        # Event 3 completed within the last two days, so its scores may change.
+        assert sync.watermark(16) == now - timedelta(days=2)
+        assert store.covers(16, start, now + timedelta(days=7))
+
+        # Only the events from the watermark on are requested again, and events
+        # that are gone from that range are removed.
+        events.pop(4)
+        sync.run(now)
+        assert session.calls == 5 + 2
+        assert sorted(store.event_ids(league_id=16)) == [1, 2, 3, 4]
+
+        events[3] = event(4, 1, "complete")
+        sync.run(now + timedelta(days=5))
+        assert sync.watermark(16) == now + timedelta(days=3)
+        assert not sync.is_final(event(6, 0, "complete", False))
+        assert sync.is_final(event(6, 0, "canceled", False))
+
+        store.clear()
+        assert sync.watermark(16) == start
+
+        # Events that aren't final more than a week after they start no longer hold
+        # the watermark back.
+        events[:] = [
+            event(7, -20, "postponed", False),
+            event(8, -15, "complete", False),
+            event(9, -3, "suspended", False),
+        ]
+        sync.run(now)
+        assert sync.watermark(16) == now - timedelta(days=3)
+        store.close()
+
+    def test_line_poller(self, current_lines, monkeypatch):
+        args = ([4143379, 4143378], [401, 83, 402], [5, 20])
+        c = current_lines(*args, "test_current_lines_nfl2")
+        lines = [dict(line) for line in c._raw["currentLines"]]
+
+        class PollSession:
+            client = None
+
+            def execute(self, document):
+                return {"currentLines": [dict(line) for line in lines]}
+
+        monkeypatch.setattr(CurrentLines, "session", PollSession())
+        poller = LinePoller(CurrentLines, *args)
+        deltas = poller.poll()
+        assert len(deltas) == len(poller) == len(lines)
+        assert all(d["change"] == "inserted" for d in deltas)
+        assert deltas[0]["old decimal odds"] is None
+        assert poller.poll() == []
+
+        # The same values returned as strings are not a change.
+        same = lines[-1]
+        same["eid"], same["ap"] = str(same["eid"]), str(same["ap"])
+        assert poller.poll() == []
+        same["ap"] = str(int(same["ap"]) + 5)
+        deltas = poller.poll()
+        assert len(deltas) == 1
+        assert deltas[0]["american odds"] == deltas[0]["old american odds"] + 5
+        assert poller.poll() == []
+
+        changed = lines[0]
+        removed = lines.pop(1)
+        old_odds = changed["pri"]
+        changed["pri"] = old_odds + 0.5
+        # A newer timestamp alone is not a change.
+        lines[2]["tim"] += 1000
+        deltas = poller.poll()
+        assert [d["change"] for d in deltas] == ["changed", "removed"]
+        assert deltas[0]["decimal odds"] == old_odds + 0.5
+        assert deltas[0]["old decimal odds"] == old_odds
+        assert deltas[0]["event id"] == changed["eid"]
+        assert deltas[1]["participant id"] == removed["partid"]
+        assert deltas[1]["decimal odds"] == removed["pri"]
+
+        lines.append(removed)
+        deltas = poller.poll()
+        assert [d["change"] for d in deltas] == ["inserted"]
+        assert len(poller.lines()) == len(lines)
+
+        poller.reset()
+        assert len(poller.poll()) == len(lines)
+
+    def test_scheduler(self, current_lines, monkeypatch):
+        calls = []
+
+        def flaky(codes):
+            def fn():
+                calls.append(time.monotonic())
+                if codes:
+                    raise TransportServerError("throttled", codes.pop(0))
+                return len(calls)
+
+            return fn
+
+        s = Scheduler(rate=1000, backoff=0.001, max_retries=2)
+        assert s.run(flaky([429, 503])) == 3
+        assert s.current_rate < 1000
+        with pytest.raises(TransportServerError):
+            s.run(flaky([400, 429]))
+        assert len(calls) == 4
+        with pytest.raises(TransportServerError):
+            s.run(flaky([500, 500, 500]))
+        assert len(calls) == 7
+        assert asyncio.run(s.run_async(lambda: asyncio.sleep(0))) is None
+
+        # Five requests from a bucket holding one token refilled 50 times a second.
+        calls.clear()
+        s = Scheduler(rate=50, burst=1)
+        for _ in range(5):
+            s.run(flaky([]))
+        assert calls[-1] - calls[0] >= 0.07
+
+        # Waiting requests are sent by priority, then in order.
+        s = Scheduler(rate=1000, max_concurrent=1)
+        started = []
+        s.acquire()
+
+        def send(name, priority):
+            s.run(lambda: started.append(name), priority)
+
+        threads = []
+        for name, priority in [("low", LOW), ("normal 1", 5), ("high", HIGH)]:
+            threads.append(threading.Thread(target=send, args=(name, priority)))
+            threads[-1].start()
+            time.sleep(0.02)
+        threads.append(threading.Thread(target=send, args=("normal 2", 5)))
+        threads[-1].start()
+        time.sleep(0.02)
+        s.release()
+        for t in threads:
+            t.join()
+        assert started == ["high", "normal 1", "normal 2", "low"]
+
+        # Waiting tasks are woken when a slot is freed, from any thread, rather than
+        # checking for one over and over.
+        s = Scheduler(rate=1000, max_concurrent=1)
+        tries = []
+        try_acquire = s._try_acquire
+        s._try_acquire = lambda ticket: tries.append(ticket) or try_acquire(ticket)
+
+        async def send_async(name, priority):
+            async def fn():
+                started.append(name)
+
+            await s.run_async(fn, priority)
+
+        async def wait_for_slot():
+            s.acquire()
+            tasks = [
+                asyncio.create_task(send_async(name, priority))
+                for name, priority in [("low", LOW), ("high", HIGH), ("gone", HIGH)]
+            ]
+            await asyncio.sleep(0.05)
+            tasks.pop().cancel()
+            threading.Timer(0.05, s.release).start()
+            await asyncio.gather(*tasks)
+
+        started.clear()
+        asyncio.run(wait_for_slot())
+        assert started == ["high", "low"]
+        assert len(tries) <= 8
+        assert s._waiting == [] and s._async_waiters == {}
+
+        with pytest.raises(ValueError):
+            Scheduler(rate=0)
+
+        # Queries go through the scheduler of their class.
+        args = ([4143379, 4143378], [401, 83, 402], [5, 20])
+        response = current_lines(*args, "test_current_lines_nfl2").raw()
+        codes = [429]
+
+        class ThrottledSession:
+            client = None
+
+            def execute(self, document):
+                if codes:
+                    raise TransportServerError("throttled", codes.pop())
+                return response
+
+        monkeypatch.setattr(CurrentLines, "session", ThrottledSession())
+        with pytest.raises(TransportServerError):
+            CurrentLines(*args)
+        codes.append(429)
+        monkeypatch.setattr(Query, "scheduler", Scheduler(rate=100, backoff=0.001))
+        assert CurrentLines(*args).raw() == response
+        assert CurrentLines.priority == HIGH